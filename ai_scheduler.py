@@ -0,0 +1,118 @@
+import numpy as np
+
+class AIScheduler:
+    """Decides which enemies get an AI update this frame, and with what dt.
+
+    Enemies are sorted into three bands by their distance to the center
+    of the view (the player, unless the camera is held at a map edge):
+
+    - near (within full_rate_distance): updated every frame
+    - mid-range (within sleep_distance): updated every reduced_rate frames
+      with all the time accumulated since their last update
+    - far: asleep and not visited at all
+
+    Only the enemies returned by a spatial hash radius query are looked at,
+    so a large population costs about as much as the enemies around the
+    player. An enemy that takes damage is woken and kept at full rate for
+    wake_duration seconds wherever it is.
+    """
+
+    def __init__(self, full_rate_distance=564, sleep_distance=768, reduced_rate=3, wake_duration=2.0,
+                 view_size=None, map_size=None):
+        self.full_rate_distance = full_rate_distance
+        # Without sizes the bands are centered on the player
+        self.view_size = view_size
+        self.map_size = map_size
+        self.sleep_distance = sleep_distance
+        self.reduced_rate = reduced_rate
+        self.wake_duration = wake_duration
+        self.frame = 0
+        self.next_phase = 0
+        self.woken = {}  # enemy -> seconds left at full rate
+
+        # Counters for the last frame, for profiling
+        self.full_rate = 0
+        self.reduced = 0
+        self.waiting = 0
+        self.sleeping = 0
+
+    def view_center(self, player):
+        """Center of the camera view, which follows the player like main.Camera."""
+        if self.view_size is None:
+            return player.rect.center
+        view_width, view_height = self.view_size
+        map_width, map_height = self.map_size
+        rect = player.rect
+        left = max(0, min(rect.x - view_width // 2, map_width - view_width))
+        top = max(0, min(rect.y - view_height // 2, map_height - view_height))
+        return (left + view_width // 2, top + view_height // 2)
+
+    def schedule(self, dt, player, spatial_hash):
+        """Return (enemies, dts): the enemies to update this frame and the dt for each."""
+        self.frame += 1
+        player_x, player_y = self.view_center(player)
+        full_rate_sq = self.full_rate_distance * self.full_rate_distance
+        active = []
+        dts = []
+        self.full_rate = self.reduced = self.waiting = 0
+
+        # Which of the enemies in range are near, read from the world in one pass
+        nearby = spatial_hash.query_radius(player_x, player_y, self.sleep_distance)
+        near = []
+        if nearby:
+            world = nearby[0].world
+            ids = np.fromiter((enemy.eid for enemy in nearby), dtype=np.int64, count=len(nearby))
+            half_size = world.size[ids] // 2
+            dx = world.x[ids] + half_size - player_x
+            dy = world.y[ids] + half_size - player_y
+            near = (dx * dx + dy * dy <= full_rate_sq).tolist()
+
+        for enemy, is_near in zip(nearby, near):
+            if enemy.woken:
+                enemy.woken = False
+                self.woken[enemy] = self.wake_duration
+            if enemy in self.woken:
+                continue
+
+            enemy.ai_dt += dt
+            if is_near:
+                self.full_rate += 1
+            else:
+                # Spread mid-range updates evenly over the frames
+                if enemy.ai_phase is None:
+                    enemy.ai_phase = self.next_phase
+                    self.next_phase = (self.next_phase + 1) % self.reduced_rate
+                if (self.frame + enemy.ai_phase) % self.reduced_rate:
+                    self.waiting += 1
+                    continue
+                self.reduced += 1
+            active.append(enemy)
+            dts.append(enemy.ai_dt)
+            enemy.ai_dt = 0
+
+        # Damaged enemies run at full rate until their wake time is up
+        for enemy, remaining in list(self.woken.items()):
+            if enemy not in spatial_hash:
+                # Killed and removed from the level
+                del self.woken[enemy]
+                continue
+            active.append(enemy)
+            dts.append(enemy.ai_dt + dt)
+            enemy.ai_dt = 0
+            self.full_rate += 1
+            if remaining > dt:
+                self.woken[enemy] = remaining - dt
+            else:
+                del self.woken[enemy]
+
+        self.sleeping = len(spatial_hash) - len(active) - self.waiting
+        return active, dts
+
+    def stats(self):
+        """Band sizes for the last frame, for profiling."""
+        return {
+            'full_rate': self.full_rate,
+            'reduced': self.reduced,
+            'waiting': self.waiting,
+            'sleeping': self.sleeping,
+        }
@@ -0,0 +1,52 @@
+import json
+import os
+
+# Default data file, next to this module
+ENEMY_TYPES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'enemy_types.json')
+
+class EnemyArchetype:
+    """Stats and draw parameters shared by every enemy of one type.
+
+    Ranges are given in tiles and scaled by the enemy's size when an
+    enemy is created. Archetypes are read-only once loaded.
+    """
+
+    __slots__ = ('name', 'speed', 'health', 'damage', 'attack_range', 'detection_range',
+                 'color', 'anim_speed', 'passes_walls', 'shape', 'eye_color')
+
+    def __init__(self, name, data):
+        set_field = object.__setattr__
+        set_field(self, 'name', name)
+        set_field(self, 'speed', data['speed'])
+        set_field(self, 'health', data['health'])
+        set_field(self, 'damage', data['damage'])
+        set_field(self, 'attack_range', data['attack_range'])
+        set_field(self, 'detection_range', data['detection_range'])
+        set_field(self, 'color', tuple(data['color']))
+        set_field(self, 'anim_speed', data['anim_speed'])
+        set_field(self, 'passes_walls', data.get('passes_walls', False))
+        draw = data.get('draw', {})
+        set_field(self, 'shape', draw.get('shape', name))
+        set_field(self, 'eye_color', tuple(draw.get('eye_color', (0, 0, 0))))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("EnemyArchetype is read-only")
+
+    # Shared and immutable, so copies of an enemy keep the same archetype
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self):
+        return "EnemyArchetype(%r)" % self.name
+
+def load_archetypes(path=ENEMY_TYPES_PATH):
+    """Read enemy archetypes from a JSON file, keeping the file's order."""
+    with open(path) as f:
+        data = json.load(f)
+    return {name: EnemyArchetype(name, fields) for name, fields in data.items()}
+
+# Registry of every enemy type, by name
+ARCHETYPES = load_archetypes()
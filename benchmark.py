@@ -0,0 +1,419 @@
+import os
+
+# Everything is drawn to offscreen surfaces; the dummy drivers mean no
+# window or audio device is needed
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import argparse
+import copy
+import json
+import math
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import pygame
+
+# Every scenario is built from this seed, so runs are comparable
+SEED = 1234
+TILE_SIZE = 32
+SCREEN_SIZE = (800, 600)
+DT = 1.0 / 60
+
+DUNGEON_SIZES = (50, 100, 150)
+ENEMY_COUNTS = (10, 100, 1000)
+# Enemies packed into the same small area, so crowd density grows with the count
+CLUSTER_COUNTS = (100, 200, 400, 800)
+
+# Allowed slowdown of a benchmark's fastest run against the baseline's
+DEFAULT_THRESHOLD = 0.25
+# Slowdowns smaller than this many milliseconds are timer and scheduler
+# noise, whatever the ratio
+NOISE_FLOOR_MS = 0.1
+
+RESULTS_VERSION = 1
+
+# Scenario name -> (setup, repeat, warmup). setup() builds the scenario
+# and returns the function that is timed, once per repeat. A scenario
+# whose runs change its own state returns (reset, run) instead, and
+# reset() is called, untimed, before every run.
+BENCHMARKS = {}
+
+def benchmark(name, repeat=20, warmup=2):
+    """Register a scenario's setup function under a name."""
+    def register(setup):
+        BENCHMARKS[name] = (setup, repeat, warmup)
+        return setup
+    return register
+
+def build_level(enemy_count, seed=SEED):
+    """A 100x100 level with the player at the start and enemy_count enemies."""
+    from player import Player
+    from level import DungeonGenerator, LevelContext
+
+    random.seed(seed)
+    generator = DungeonGenerator(100, 100, TILE_SIZE)
+    level_map, start_pos, exit_pos = generator.generate_dungeon()
+    player = Player(start_pos[0], start_pos[1], TILE_SIZE, generator.world)
+    enemies = generator.spawn_enemies(enemy_count, player)
+    items = generator.spawn_items(5)
+    return player, LevelContext(level_map, enemies, items, TILE_SIZE)
+
+def resettable(state, step):
+    """(reset, run) timing step(*state), each run from a fresh copy of state.
+
+    reset() also reseeds random, so every run does the same work.
+    """
+    live = [None]
+
+    def reset():
+        random.seed(SEED)
+        live[0] = copy.deepcopy(state)
+
+    def run():
+        step(*live[0])
+    return reset, run
+
+def _flush(player, level):
+    # End-of-frame removal, as in Simulation.step
+    for enemy in level.enemies.flush():
+        level.enemy_grid.remove(enemy)
+        enemy.despawn()
+        player.score += 10
+    for item in level.items.flush():
+        item.despawn()
+
+# Dungeon generation
+
+def _generate_dungeon(size):
+    from level import DungeonGenerator
+
+    def setup():
+        def run():
+            random.seed(SEED)
+            DungeonGenerator(size, size, TILE_SIZE).generate_dungeon()
+        return run
+    return setup
+
+for size in DUNGEON_SIZES:
+    benchmark('generate_dungeon_%d' % size, repeat=10, warmup=1)(_generate_dungeon(size))
+
+# Simulation: one tick of the player and of the enemies
+
+def _player_update(enemy_count):
+    from controls import InputState, RIGHT, ATTACK
+    from simulation import SilentSound
+
+    def setup():
+        player, level = build_level(enemy_count)
+        sound = SilentSound()
+        # Pack every enemy into the attack cones either side of the player,
+        # so each attack hits all of them and the cost scales with the count
+        rng = random.Random(SEED)
+        center_x, center_y = player.rect.center
+        for i, enemy in enumerate(level.enemies):
+            angle = (math.pi if i % 2 else 0.0) + rng.uniform(-math.pi / 4, math.pi / 4)
+            distance = rng.uniform(0.1, 0.8) * player.attack_range
+            half = enemy.size // 2
+            enemy.move_to(center_x + int(math.cos(angle) * distance) - half,
+                          center_y + int(math.sin(angle) * distance) - half)
+            enemy.health = 1e9
+            level.enemy_grid.update(enemy)
+        # Step right, attacking
+        inputs = InputState(RIGHT | ATTACK)
+
+        def step(player, level):
+            player.update(DT, inputs, level.level_map, level.enemies, level.items, sound,
+                          level.enemy_grid, level.item_grid, level.geometry)
+            _flush(player, level)
+        return resettable((player, level), step)
+    return setup
+
+def _enemy_update(enemy_count):
+    from simulation import SilentSound
+
+    def setup():
+        player, level = build_level(enemy_count)
+        sound = SilentSound()
+        # The flow field only changes when the player changes tile
+        level.flow_field.update_from_position(player.rect.centerx, player.rect.centery, TILE_SIZE)
+
+        def step(player, level):
+            # Every enemy, at full rate, through the per-object update
+            level.flow_field.update_from_position(player.rect.centerx, player.rect.centery, TILE_SIZE)
+            level.pathfinder.update()
+            for enemy in level.enemies:
+                enemy.update(DT, level.level_map, player, level.enemies, sound, level.enemy_grid,
+                             level.flow_field, level.pathfinder, level.line_of_sight, level.geometry)
+        return resettable((player, level), step)
+    return setup
+
+def _enemy_batch(enemy_count):
+    from simulation import SilentSound
+
+    def setup():
+        player, level = build_level(enemy_count)
+        sound = SilentSound()
+        level.flow_field.update_from_position(player.rect.centerx, player.rect.centery, TILE_SIZE)
+
+        def step(player, level):
+            # The game's own path: AI scheduling and one vectorized update
+            level.flow_field.update_from_position(player.rect.centerx, player.rect.centery, TILE_SIZE)
+            level.pathfinder.update()
+            active, dts = level.ai_scheduler.schedule(DT, player, level.enemy_grid)
+            level.enemy_batch.update(dts, active, player, sound, level.enemy_grid,
+                                     level.flow_field, level.pathfinder, level.line_of_sight)
+        return resettable((player, level), step)
+    return setup
+
+for count in ENEMY_COUNTS:
+    benchmark('player_update_%d' % count, repeat=40)(_player_update(count))
+    benchmark('enemy_update_%d' % count, repeat=20)(_enemy_update(count))
+    benchmark('enemy_batch_%d' % count, repeat=40)(_enemy_batch(count))
+
+def _separation_cluster(enemy_count):
+    def setup():
+        player, level = build_level(enemy_count)
+        # Pack every enemy within three tiles of the player
+        rng = random.Random(SEED)
+        for enemy in level.enemies:
+            enemy.move_to(player.rect.x + rng.randint(-3 * TILE_SIZE, 3 * TILE_SIZE),
+                          player.rect.y + rng.randint(-3 * TILE_SIZE, 3 * TILE_SIZE))
+            level.enemy_grid.update(enemy)
+
+        def step(level):
+            # Neighbour search and push for every enemy in the crowd; the
+            # neighbour cap should keep this linear in the enemy count
+            for enemy in level.enemies:
+                enemy._separation_push(level.enemy_grid)
+        return resettable((level,), step)
+    return setup
+
+for count in CLUSTER_COUNTS:
+    benchmark('separation_cluster_%d' % count, repeat=20)(_separation_cluster(count))
+
+@benchmark('particle_combat', repeat=60, warmup=10)
+def particle_combat():
+    """The player surrounded by enemies, everyone attacking every tick."""
+    from controls import InputState, RIGHT, ATTACK
+    from particles import ParticleBatch
+    from simulation import SilentSound
+    from main import Camera
+
+    player, level = build_level(40)
+    sound = SilentSound()
+    player.speed = 0  # turn to attack in each direction without moving
+    rng = random.Random(SEED)
+    for enemy in level.enemies:
+        enemy.move_to(player.rect.x + rng.randint(-TILE_SIZE, TILE_SIZE), player.rect.y + rng.randint(-TILE_SIZE, TILE_SIZE))
+        enemy.health = 1e9
+        enemy.woken = True
+        level.enemy_grid.update(enemy)
+
+    surface = pygame.Surface(SCREEN_SIZE)
+    camera = Camera(100 * TILE_SIZE, 100 * TILE_SIZE)
+    camera.update(player)
+    particle_batch = ParticleBatch()
+    inputs = InputState(RIGHT | ATTACK)
+
+    def step(player, level):
+        player.update(DT, inputs, level.level_map, level.enemies, level.items, sound,
+                      level.enemy_grid, level.item_grid, level.geometry)
+        active, dts = level.ai_scheduler.schedule(DT, player, level.enemy_grid)
+        level.enemy_batch.update(dts, active, player, sound, level.enemy_grid,
+                                 level.flow_field, level.pathfinder, level.line_of_sight)
+
+        surface.fill((0, 0, 0))
+        for enemy in level.enemies:
+            enemy.draw(surface, camera.apply(enemy.rect), particle_batch)
+        player.draw(surface, camera.apply(player.rect), particle_batch)
+        particle_batch.flush(surface)
+    return resettable((player, level), step)
+
+# Rendering to an offscreen surface
+
+@benchmark('render_map', repeat=60, warmup=5)
+def render_map():
+    from main import Camera, draw_level
+
+    player, level = build_level(0)
+    surface = pygame.Surface(SCREEN_SIZE)
+    camera = Camera(100 * TILE_SIZE, 100 * TILE_SIZE)
+    camera.update(player)
+
+    def run():
+        surface.fill((0, 0, 0))
+        draw_level(surface, level.geometry, camera)
+    return run
+
+def _draw_ui(screen):
+    from ui import UI
+
+    def setup():
+        player, level = build_level(0)
+        ui = UI(*SCREEN_SIZE)
+        ui.rng.seed(SEED)
+        surface = pygame.Surface(SCREEN_SIZE)
+        draw = {
+            'main_menu': lambda: ui.draw_main_menu(surface, 1.0),
+            'game_ui': lambda: ui.draw_game_ui(surface, player, 1),
+            'game_over': lambda: ui.draw_game_over(surface, 1234),
+            'victory': lambda: ui.draw_victory(surface, 1234),
+        }[screen]
+
+        def run():
+            surface.fill((0, 0, 0))
+            draw()
+        return run
+    return setup
+
+for screen in ('main_menu', 'game_ui', 'game_over', 'victory'):
+    benchmark('ui_' + screen, repeat=60, warmup=5)(_draw_ui(screen))
+
+# Sound
+
+@benchmark('generate_sounds', repeat=3, warmup=1)
+def generate_sounds():
+    """Synthesize every sound effect, with no cache."""
+    from main import SoundGenerator
+
+    def run():
+        SoundGenerator().generate_sounds()
+    return run
+
+@benchmark('generate_sounds_cached', repeat=10, warmup=1)
+def generate_sounds_cached():
+    """Load every sound effect from a warm on-disk cache."""
+    from main import SoundGenerator
+    from sound_cache import SoundCache
+
+    cache = SoundCache(tempfile.mkdtemp(prefix='dungeon-bench-'))
+    SoundGenerator(cache).generate_sounds()
+
+    def run():
+        SoundGenerator(cache).generate_sounds()
+    return run
+
+def time_benchmark(name, repeat=None):
+    """Run one scenario; returns its timings in milliseconds."""
+    setup, default_repeat, warmup = BENCHMARKS[name]
+    repeat = repeat or default_repeat
+    scenario = setup()
+    reset, run = scenario if isinstance(scenario, tuple) else (None, scenario)
+    for _ in range(warmup):
+        if reset is not None:
+            reset()
+        run()
+    times = []
+    for _ in range(repeat):
+        if reset is not None:
+            reset()
+        start = time.perf_counter()
+        run()
+        times.append((time.perf_counter() - start) * 1000.0)
+    return {
+        'repeat': repeat,
+        'min_ms': min(times),
+        'median_ms': statistics.median(times),
+        'mean_ms': statistics.mean(times),
+        'stdev_ms': statistics.stdev(times) if repeat > 1 else 0.0,
+    }
+
+def run_benchmarks(names, repeat=None):
+    results = {}
+    for name in names:
+        results[name] = time_benchmark(name, repeat)
+        print("%-26s %10.3f ms  (median %.3f, +/- %.3f)" % (
+            name, results[name]['min_ms'], results[name]['median_ms'], results[name]['stdev_ms']))
+    return {
+        'version': RESULTS_VERSION,
+        'seed': SEED,
+        'python': platform.python_version(),
+        'pygame': pygame.version.ver,
+        'platform': platform.platform(),
+        'results': results,
+    }
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD, thresholds=None, noise_floor_ms=NOISE_FLOOR_MS):
+    """Compare fastest-run times with a baseline.
+
+    The fastest run is the one least disturbed by the rest of the machine.
+    A benchmark regresses when it exceeds the baseline's by more than its
+    threshold, a fraction (0.25 = 25% slower), and by more than
+    noise_floor_ms. thresholds maps benchmark names to their own threshold.
+    Returns a row per benchmark found in both:
+    (name, baseline_ms, current_ms, ratio, limit, regressed).
+    """
+    thresholds = thresholds or {}
+    rows = []
+    for name, current in results['results'].items():
+        previous = baseline['results'].get(name)
+        if previous is None:
+            continue
+        limit = thresholds.get(name, threshold)
+        before, after = previous['min_ms'], current['min_ms']
+        ratio = after / before if before > 0 else 1.0
+        regressed = ratio > 1.0 + limit and after - before > noise_floor_ms
+        rows.append((name, before, after, ratio, limit, regressed))
+    return rows
+
+def _threshold_override(text):
+    name, _, value = text.partition('=')
+    if not name or not value:
+        raise argparse.ArgumentTypeError("expected NAME=FRACTION, got %r" % text)
+    return name, float(value)
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Benchmark the game's hot paths")
+    parser.add_argument('names', nargs='*',
+                        help="run only benchmarks whose names contain one of these")
+    parser.add_argument('--list', action='store_true', help="list the benchmarks and exit")
+    parser.add_argument('--repeat', type=int, default=None,
+                        help="timed runs per benchmark, instead of each one's default")
+    parser.add_argument('--output', metavar='PATH', help="write the results as JSON")
+    parser.add_argument('--baseline', metavar='PATH',
+                        help="results JSON to compare against, exiting with status 1 on a regression")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown against the baseline (default: %(default)s = 25%%)")
+    parser.add_argument('--noise-floor', type=float, default=NOISE_FLOOR_MS, metavar='MS',
+                        help="slowdowns below this many milliseconds never count (default: %(default)s)")
+    parser.add_argument('--threshold-for', type=_threshold_override, action='append', default=[],
+                        metavar='NAME=FRACTION', help="allowed slowdown for one benchmark")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    names = [name for name in BENCHMARKS
+             if not args.names or any(part in name for part in args.names)]
+    if args.list:
+        print("\n".join(names))
+        return 0
+
+    pygame.init()
+    pygame.mixer.init(frequency=44100, size=-16, channels=2)
+    results = run_benchmarks(names, args.repeat)
+    pygame.quit()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    rows = compare(results, baseline, args.threshold, dict(args.threshold_for), args.noise_floor)
+    print()
+    print("%-26s %12s %12s %8s" % ("benchmark", "baseline ms", "current ms", "change"))
+    for name, previous, current, ratio, limit, regressed in rows:
+        print("%-26s %12.3f %12.3f %+7.1f%%%s" % (
+            name, previous, current, (ratio - 1) * 100, "  REGRESSION (limit %+.0f%%)" % (limit * 100) if regressed else ""))
+    regressions = [row for row in rows if row[-1]]
+    print("\n%d of %d benchmarks regressed" % (len(regressions), len(rows)))
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+import math
+from tiles import WALL
+
+# Wall collision against the level's tile grid, shared by the player and
+# enemies. Boxes are tested straight against level_map with integer tile
+# maths, so no Rects are created per wall tile.
+
+class SubstepBudget:
+    """Caps the collision sub-steps spent on fast movers in one frame.
+
+    Moves no longer than a tile take a single step and cost nothing.
+    Longer moves are split into tile-sized sub-steps, the extra ones drawn
+    from the frame's budget; once it runs out, a long move is cut short to
+    the steps it was granted, so it still cannot pass through a wall.
+    """
+
+    def __init__(self, max_substeps=256):
+        self.max_substeps = max_substeps
+        self.remaining = max_substeps
+
+        # Counters for profiling
+        self.substeps_last_frame = 0
+        self.swept_moves = 0
+        self.clamped_moves = 0
+
+    def begin_frame(self):
+        self.substeps_last_frame = self.max_substeps - self.remaining
+        self.remaining = self.max_substeps
+
+    def take(self, count):
+        """Grant up to count extra sub-steps; returns how many were granted."""
+        granted = min(count, self.remaining)
+        self.remaining -= granted
+        self.swept_moves += 1
+        if granted < count:
+            self.clamped_moves += 1
+        return granted
+
+    def stats(self):
+        return {
+            'substeps_last_frame': self.substeps_last_frame,
+            'swept_moves': self.swept_moves,
+            'clamped_moves': self.clamped_moves,
+        }
+
+# Shared by every mover; main starts a new frame on it
+substep_budget = SubstepBudget()
+
+def overlaps_wall(level_map, tile_size, x, y, width, height):
+    """True if the box at (x, y) touches a wall tile or leaves the map."""
+    x1 = x // tile_size
+    y1 = y // tile_size
+    x2 = (x + width - 1) // tile_size
+    y2 = (y + height - 1) // tile_size
+    if x1 < 0 or y1 < 0 or y2 >= len(level_map) or x2 >= len(level_map[0]):
+        return True
+    for row in level_map[y1:y2 + 1]:
+        if WALL in row[x1:x2 + 1]:
+            return True
+    return False
+
+def swept_box_hits_wall(geometry, x, y, width, height, dx, dy):
+    """Broad phase: whether the box covering a whole move touches a wall block."""
+    left = math.floor(min(x, x + dx))
+    top = math.floor(min(y, y + dy))
+    right = math.ceil(max(x, x + dx)) + width
+    bottom = math.ceil(max(y, y + dy)) + height
+    return geometry.box_hits_wall(left, top, int(right - left), int(bottom - top))
+
+def substeps_for(dx, dy, tile_size, budget):
+    """Number of sub-steps for a move, and the fraction of it to cover.
+
+    A move is split so no sub-step exceeds a tile; extra sub-steps come
+    from the budget, and a move granted fewer is shortened to match.
+    """
+    longest = max(abs(dx), abs(dy))
+    if longest <= tile_size:
+        return 1, 1.0
+    steps = math.ceil(longest / tile_size)
+    granted = budget.take(steps - 1) + 1
+    if granted < steps:
+        return granted, granted * tile_size / longest
+    return steps, 1.0
+
+def move_and_collide(rect, dx, dy, level_map, tile_size, budget=None, geometry=None):
+    """Move rect by (dx, dy), stopping flush against walls on each axis.
+
+    X and Y are resolved separately, so a box blocked on one axis still
+    slides along the wall on the other. Moves longer than a tile are swept
+    in tile-sized sub-steps so fast movers cannot skip over a wall.
+    Returns the contact normal (normal_x, normal_y): a component is -1 or
+    1 when a wall on that axis stopped the move (pointing away from the
+    wall), otherwise 0.
+
+    With a LevelGeometry, a long move whose swept box touches no wall
+    block is made in one go without spending sub-steps.
+    """
+    if geometry is not None and max(abs(dx), abs(dy)) > tile_size:
+        if not swept_box_hits_wall(geometry, rect.x, rect.y, rect.width, rect.height, dx, dy):
+            rect.x += dx
+            rect.y += dy
+            return 0, 0
+
+    steps, scale = substeps_for(dx, dy, tile_size, budget or substep_budget)
+    if steps == 1:
+        return _step(rect, dx * scale, dy * scale, level_map, tile_size)
+
+    step_x = dx * scale / steps
+    step_y = dy * scale / steps
+    normal_x = normal_y = 0
+    for _ in range(steps):
+        hit_x, hit_y = _step(rect, step_x, step_y, level_map, tile_size)
+        # Stop moving along an axis once a wall is hit on it
+        if hit_x:
+            normal_x, step_x = hit_x, 0
+        if hit_y:
+            normal_y, step_y = hit_y, 0
+        if not step_x and not step_y:
+            break
+    return normal_x, normal_y
+
+def _step(rect, dx, dy, level_map, tile_size):
+    # One sub-step of at most a tile per axis
+    normal_x = normal_y = 0
+    width, height = rect.width, rect.height
+
+    if dx:
+        old_x = rect.x
+        rect.x += dx
+        if overlaps_wall(level_map, tile_size, rect.x, rect.y, width, height):
+            if dx > 0:
+                # Stop at the near face of the wall column moved into
+                rect.x = (rect.right - 1) // tile_size * tile_size - width
+                normal_x = -1
+            else:
+                rect.x = (rect.x // tile_size + 1) * tile_size
+                normal_x = 1
+            if overlaps_wall(level_map, tile_size, rect.x, rect.y, width, height):
+                # Already stuck before moving; stay put
+                rect.x = old_x
+
+    if dy:
+        old_y = rect.y
+        rect.y += dy
+        if overlaps_wall(level_map, tile_size, rect.x, rect.y, width, height):
+            if dy > 0:
+                rect.y = (rect.bottom - 1) // tile_size * tile_size - height
+                normal_y = -1
+            else:
+                rect.y = (rect.y // tile_size + 1) * tile_size
+                normal_y = 1
+            if overlaps_wall(level_map, tile_size, rect.x, rect.y, width, height):
+                rect.y = old_y
+
+    return normal_x, normal_y
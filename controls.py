@@ -0,0 +1,87 @@
+import random
+import pygame
+
+# Buttons are bits of an input mask, so one tick of input fits in a byte
+LEFT, RIGHT, UP, DOWN, ATTACK = 1, 2, 4, 8, 16
+MOVE_BUTTONS = (LEFT, RIGHT, UP, DOWN)
+
+# Keys that press each button
+KEY_BINDINGS = {
+    LEFT: (pygame.K_LEFT, pygame.K_a),
+    RIGHT: (pygame.K_RIGHT, pygame.K_d),
+    UP: (pygame.K_UP, pygame.K_w),
+    DOWN: (pygame.K_DOWN, pygame.K_s),
+    ATTACK: (pygame.K_SPACE,),
+}
+
+class InputState:
+    """The buttons held down during one tick."""
+
+    __slots__ = ('buttons',)
+
+    def __init__(self, buttons=0):
+        self.buttons = buttons
+
+    def pressed(self, button):
+        return bool(self.buttons & button)
+
+    def __repr__(self):
+        return "InputState(%d)" % self.buttons
+
+# Input sources: poll() is called once per tick and returns an InputState
+
+class KeyboardInput:
+    """Reads the player's buttons from the keyboard."""
+
+    def poll(self):
+        keys = pygame.key.get_pressed()
+        buttons = 0
+        for button, bound_keys in KEY_BINDINGS.items():
+            if any(keys[key] for key in bound_keys):
+                buttons |= button
+        return InputState(buttons)
+
+class NullInput:
+    """Never presses anything."""
+
+    def poll(self):
+        return InputState()
+
+class ScriptedInput:
+    """Plays back a fixed list of input masks, then presses nothing."""
+
+    def __init__(self, masks):
+        self.masks = list(masks)
+        self.tick = 0
+
+    def poll(self):
+        buttons = self.masks[self.tick] if self.tick < len(self.masks) else 0
+        self.tick += 1
+        return InputState(buttons)
+
+class RandomInput:
+    """Wanders in random directions and attacks now and then.
+
+    Each direction is held for several ticks so the player actually
+    covers ground. Uses its own seeded generator, so the same seed gives
+    the same input stream.
+    """
+
+    def __init__(self, seed=None, min_hold=10, max_hold=60, attack_chance=0.1):
+        self.rng = random.Random(seed)
+        self.min_hold = min_hold
+        self.max_hold = max_hold
+        self.attack_chance = attack_chance
+        self.held = 0
+        self.hold_ticks = 0
+
+    def poll(self):
+        if self.hold_ticks <= 0:
+            # Up to two directions at once, so diagonals happen too
+            self.held = self.rng.choice(MOVE_BUTTONS) | self.rng.choice((0,) + MOVE_BUTTONS)
+            self.hold_ticks = self.rng.randint(self.min_hold, self.max_hold)
+        self.hold_ticks -= 1
+        buttons = self.held
+        if self.rng.random() < self.attack_chance:
+            buttons |= ATTACK
+        return InputState(buttons)
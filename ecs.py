@@ -0,0 +1,240 @@
+import numpy as np
+import pygame
+
+# AI states stored in the 'state' component, in the order of Enemy.state strings
+STATES = ('idle', 'chase', 'attack')
+IDLE, CHASE, ATTACK = 0, 1, 2
+
+# Component name -> array dtype
+COMPONENTS = {
+    # Position (top-left corner, pixels) and last frame's velocity (pixels/s)
+    'x': np.float64,
+    'y': np.float64,
+    'vx': np.float64,
+    'vy': np.float64,
+    'size': np.float64,
+    # Health and the white flash after a hit
+    'health': np.float64,
+    'max_health': np.int64,
+    'hit_flash': np.float64,
+    'invulnerable_timer': np.float64,
+    # Player combat
+    'attack_power': np.int64,
+    'attack_timer': np.float64,
+    # Animation
+    'anim_timer': np.float64,
+    'anim_frame': np.int64,
+    'anim_speed': np.float64,
+    # AI state
+    'state': np.int64,
+    'direction': np.int64,
+    'move_timer': np.float64,
+    'speed': np.float64,
+    'attack_range': np.float64,
+    'detection_range': np.float64,
+    'passes_walls': np.bool_,
+    # Item hover, spin and sparkle timing
+    'hover_offset': np.float64,
+    'hover_direction': np.int64,
+    'rotation': np.float64,
+    'particle_timer': np.float64,
+    # Render info: index of the archetype in World.kinds
+    'kind': np.int64,
+}
+
+class World:
+    """Entity components stored in contiguous NumPy arrays.
+
+    An entity is just an id: the index of its row in every component
+    array. Systems update many entities at once by indexing the arrays
+    with an array of ids, and the game objects (Player, Enemy, Item) are
+    thin views that read and write their own row. Ids of despawned entities are
+    reused, and the arrays double in size when they run out of room.
+    """
+
+    def __init__(self, capacity=64):
+        self.capacity = capacity
+        self.arrays = {name: np.zeros(capacity, dtype=dtype) for name, dtype in COMPONENTS.items()}
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.free_ids = []
+        self.next_id = 0
+        self.kinds = []  # archetypes referenced by the 'kind' component
+        self.kind_index = {}
+
+    def __getattr__(self, name):
+        # Component arrays are reachable as world.x, world.health, ...
+        try:
+            return self.__dict__['arrays'][name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def spawn(self, **components):
+        """Create an entity with the given component values and return its id."""
+        if self.free_ids:
+            entity_id = self.free_ids.pop()
+        else:
+            if self.next_id == self.capacity:
+                self._grow()
+            entity_id = self.next_id
+            self.next_id += 1
+        for array in self.arrays.values():
+            array[entity_id] = 0
+        for name, value in components.items():
+            self.arrays[name][entity_id] = value
+        self.alive[entity_id] = True
+        return entity_id
+
+    def despawn(self, entity_id):
+        if self.alive[entity_id]:
+            self.alive[entity_id] = False
+            self.free_ids.append(entity_id)
+
+    def kind_id(self, archetype):
+        """Index of an archetype for the 'kind' component."""
+        index = self.kind_index.get(archetype.name)
+        if index is None:
+            index = self.kind_index[archetype.name] = len(self.kinds)
+            self.kinds.append(archetype)
+        return index
+
+    def _grow(self):
+        self.capacity *= 2
+        for name, array in self.arrays.items():
+            grown = np.zeros(self.capacity, dtype=array.dtype)
+            grown[:len(array)] = array
+            self.arrays[name] = grown
+        alive = np.zeros(self.capacity, dtype=bool)
+        alive[:len(self.alive)] = self.alive
+        self.alive = alive
+
+    def __len__(self):
+        return self.next_id - len(self.free_ids)
+
+# Game objects hold their world and entity id as self.world and self.eid
+
+def component_property(name):
+    """Property reading and writing an object's row of a component."""
+    def get(self):
+        return self.world.arrays[name].item(self.eid)
+
+    def set(self, value):
+        self.world.arrays[name][self.eid] = value
+
+    return property(get, set)
+
+class RectView:
+    """Read-only rect of an object, read live from its row of the world.
+
+    Reads like a pygame.Rect (x, y, center, right, ..., colliderect,
+    move) and can be passed wherever pygame expects a rect, but it has no
+    setters, so writing to it fails loudly instead of being lost. Objects
+    move with their move_to() method, and copy() gives a plain Rect to
+    work on, so the world stays the only copy of the position.
+    """
+
+    __slots__ = ('arrays', 'eid')
+
+    def __init__(self, world, eid):
+        self.arrays = world.arrays
+        self.eid = eid
+
+    # Positions are always whole pixels, so the stored floats convert exactly
+    @property
+    def x(self):
+        return int(self.arrays['x'].item(self.eid))
+
+    @property
+    def y(self):
+        return int(self.arrays['y'].item(self.eid))
+
+    @property
+    def width(self):
+        return int(self.arrays['size'].item(self.eid))
+
+    left = x
+    top = y
+    w = h = height = width
+
+    @property
+    def size(self):
+        return (self.width, self.width)
+
+    @property
+    def topleft(self):
+        return (self.x, self.y)
+
+    @property
+    def right(self):
+        return self.x + self.width
+
+    @property
+    def bottom(self):
+        return self.y + self.width
+
+    @property
+    def centerx(self):
+        return self.x + self.width // 2
+
+    @property
+    def centery(self):
+        return self.y + self.width // 2
+
+    @property
+    def center(self):
+        arrays, eid = self.arrays, self.eid
+        half = int(arrays['size'].item(eid)) // 2
+        return (int(arrays['x'].item(eid)) + half, int(arrays['y'].item(eid)) + half)
+
+    def copy(self):
+        """A plain pygame.Rect with the current position and size."""
+        arrays, eid = self.arrays, self.eid
+        size = int(arrays['size'].item(eid))
+        return pygame.Rect(int(arrays['x'].item(eid)), int(arrays['y'].item(eid)), size, size)
+
+    def move(self, x, y=None):
+        return self.copy().move(x) if y is None else self.copy().move(x, y)
+
+    def colliderect(self, rect):
+        return self.copy().colliderect(rect)
+
+    # Sequence of (x, y, width, height), which pygame accepts as a rect
+    def __len__(self):
+        return 4
+
+    def __getitem__(self, index):
+        return (self.x, self.y, self.width, self.width)[index]
+
+    def __repr__(self):
+        return "<RectView(%d, %d, %d, %d)>" % (self.x, self.y, self.width, self.width)
+
+# Systems: each updates one group of components for an array of ids
+
+def animation_system(world, ids, dt):
+    """Advance animation timers and frames; returns the new frames."""
+    timer = world.anim_timer[ids] + dt
+    next_frame = timer >= world.anim_speed[ids]
+    timer[next_frame] = 0
+    frame = np.where(next_frame, (world.anim_frame[ids] + 1) % 4, world.anim_frame[ids])
+    world.anim_timer[ids] = timer
+    world.anim_frame[ids] = frame
+    return frame
+
+def hit_flash_system(world, ids, dt):
+    """Count down the hit flash timers that are running."""
+    flash = world.hit_flash[ids]
+    world.hit_flash[ids] = np.where(flash > 0, flash - dt, flash)
+
+def damage_system(world, ids, amount, flash=0.1):
+    """Take amount off each entity's health and start its hit flash; returns the new health."""
+    health = world.health[ids] - amount
+    world.health[ids] = health
+    world.hit_flash[ids] = flash
+    return health
+
+def movement_system(world, ids, x, y, dt):
+    """Store new positions and the velocity that got the entities there."""
+    safe_dt = np.where(dt > 0, dt, 1.0)
+    world.vx[ids] = (x - world.x[ids]) / safe_dt
+    world.vy[ids] = (y - world.y[ids]) / safe_dt
+    world.x[ids] = x
+    world.y[ids] = y
@@ -2,57 +2,102 @@ import pygame
 import random
 import math
 import noise
+from particles import ParticleBatch
+from archetypes import ARCHETYPES
+from collision import move_and_collide
+from ecs import STATES, IDLE, component_property, RectView
+
+# Fraction of an enemy's speed spent moving away from crowding neighbours
+SEPARATION_WEIGHT = 0.75
 
 class Enemy:
-    def __init__(self, x, y, size, enemy_type):
-        self.rect = pygame.Rect(x, y, size, size)
+    """A monster roaming the dungeon.
+
+    The enemy's numeric state (position, health, timers, animation and AI
+    state) lives in a row of an ecs.World, so systems can update many
+    enemies at once; this object is a thin view over that row, plus the
+    per-enemy data that does not fit in arrays. rect is a read-only view
+    of the position in the world, which is the only copy of it; the enemy
+    moves with move_to(). Per-type stats and draw parameters live on the
+    shared EnemyArchetype.
+    """
+
+    __slots__ = ('world', 'eid', 'rect', 'size', 'enemy_type', 'archetype', 'target',
+                 'particles', 'patrol_request', 'patrol_path', 'ai_dt', 'ai_phase',
+                 'woken', 'max_neighbors')
+
+    def __init__(self, x, y, size, enemy_type, world):
+        archetype = ARCHETYPES[enemy_type]
+        self.world = world
+        self.eid = self.world.spawn(
+            x=x,
+            y=y,
+            size=size,
+            health=archetype.health,
+            anim_speed=archetype.anim_speed,
+            state=IDLE,  # idle, chase, attack
+            direction=random.randint(0, 3),  # 0: right, 1: down, 2: left, 3: up
+            speed=archetype.speed,
+            attack_range=size * archetype.attack_range,
+            detection_range=size * archetype.detection_range,
+            passes_walls=archetype.passes_walls,
+            kind=self.world.kind_id(archetype)
+        )
+        self.rect = RectView(world, self.eid)
         self.size = size
         self.enemy_type = enemy_type
-        self.speed = 0
-        self.health = 0
-        self.damage = 0
-        self.attack_range = 0
-        self.detection_range = 0
-        self.color = (0, 0, 0)
-        self.anim_frame = 0
-        self.anim_timer = 0
-        self.anim_speed = 0
-        self.direction = random.randint(0, 3)  # 0: right, 1: down, 2: left, 3: up
-        self.state = 'idle'  # idle, chase, attack
+        self.archetype = archetype
         self.target = None
-        self.move_timer = 0
         self.particles = []
-        self.hit_flash_timer = 0
-        
-        # Set properties based on enemy type
-        if enemy_type == 'slime':
-            self.speed = 80
-            self.health = 30
-            self.damage = 10
-            self.attack_range = size
-            self.detection_range = size * 5
-            self.color = (0, 255, 0)  # Green
-            self.anim_speed = 0.15
-        elif enemy_type == 'ghost':
-            self.speed = 120
-            self.health = 20
-            self.damage = 15
-            self.attack_range = size * 1.5
-            self.detection_range = size * 7
-            self.color = (200, 200, 255)  # Light blue
-            self.anim_speed = 0.1
-        elif enemy_type == 'spider':
-            self.speed = 150
-            self.health = 15
-            self.damage = 20
-            self.attack_range = size
-            self.detection_range = size * 6
-            self.color = (128, 0, 128)  # Purple
-            self.anim_speed = 0.05
-        
-    def update(self, dt, level_map, player, enemies, sound_gen):
+        self.patrol_request = None  # pending PathRequest for the next patrol route
+        self.patrol_path = []  # remaining tiles of the current patrol route
+        self.ai_dt = 0  # time accumulated since the last AI update
+        self.ai_phase = None  # frame offset for reduced-rate updates
+        self.woken = False  # set when hit so the AI scheduler wakes the enemy
+        self.max_neighbors = 6  # neighbours considered for separation
+    
+    # Components stored in the world
+    health = component_property('health')
+    hit_flash_timer = component_property('hit_flash')
+    anim_frame = component_property('anim_frame')
+    anim_timer = component_property('anim_timer')
+    anim_speed = component_property('anim_speed')
+    direction = component_property('direction')
+    move_timer = component_property('move_timer')
+    speed = component_property('speed')
+    attack_range = component_property('attack_range')
+    detection_range = component_property('detection_range')
+    
+    @property
+    def state(self):
+        return STATES[self.world.state[self.eid]]
+    
+    @state.setter
+    def state(self, value):
+        self.world.state[self.eid] = STATES.index(value)
+    
+    # Shared per-type stats
+    @property
+    def damage(self):
+        return self.archetype.damage
+    
+    @property
+    def color(self):
+        return self.archetype.color
+    
+    def move_to(self, x, y):
+        """Place the enemy's top-left corner at (x, y)."""
+        arrays = self.world.arrays
+        arrays['x'][self.eid] = x
+        arrays['y'][self.eid] = y
+    
+    def despawn(self):
+        """Free the enemy's row in the world once it has left the level."""
+        self.world.despawn(self.eid)
+    
+    def update(self, dt, level_map, player, enemies, sound_gen, spatial_hash=None, flow_field=None, pathfinder=None, line_of_sight=None, geometry=None):
         # Reset movement
-        old_x, old_y = self.rect.x, self.rect.y
+        old_x, old_y = self.rect.topleft
         
         # Update animation
         self.anim_timer += dt
@@ -65,13 +110,7 @@ class Enemy:
             self.hit_flash_timer -= dt
         
         # Update particles
-        for particle in self.particles[:]:
-            particle['timer'] -= dt
-            if particle['timer'] <= 0:
-                self.particles.remove(particle)
-            else:
-                particle['x'] += particle['vx'] * dt
-                particle['y'] += particle['vy'] * dt
+        self._update_particles(dt)
         
         # Calculate distance to player
         player_center = player.rect.center
@@ -83,76 +122,197 @@ class Enemy:
         # Determine AI state
         if distance <= self.attack_range:
             self.state = 'attack'
-        elif distance <= self.detection_range:
+        elif distance <= self.detection_range and self._can_see(player_center, line_of_sight):
             self.state = 'chase'
         else:
             self.state = 'idle'
         
+        # Patrol routes are only followed while idle
+        if self.state != 'idle':
+            self._cancel_patrol()
+        
         # Execute AI behavior based on state
         if self.state == 'idle':
-            self._idle_behavior(dt, level_map)
+            self._idle_behavior(dt, level_map, pathfinder)
         elif self.state == 'chase':
-            self._chase_behavior(dt, level_map, player_center)
+            self._chase_behavior(dt, level_map, player_center, flow_field)
         elif self.state == 'attack':
             self._attack_behavior(dt, player, sound_gen)
         
-        # Check for collision with walls
-        tile_size = self.size
-        
-        if self.enemy_type != 'ghost':  # Ghosts can move through walls
-            # Calculate grid position
-            grid_x1 = max(0, int(self.rect.left // tile_size))
-            grid_y1 = max(0, int(self.rect.top // tile_size))
-            grid_x2 = min(len(level_map[0]) - 1, int(self.rect.right // tile_size))
-            grid_y2 = min(len(level_map) - 1, int(self.rect.bottom // tile_size))
-            
-            # Check collision with walls
-            collision = False
-            for y in range(grid_y1, grid_y2 + 1):
-                for x in range(grid_x1, grid_x2 + 1):
-                    if y < len(level_map) and x < len(level_map[0]):
-                        if level_map[y][x] == 1:  # Wall
-                            wall_rect = pygame.Rect(x * tile_size, y * tile_size, tile_size, tile_size)
-                            if self.rect.colliderect(wall_rect):
-                                collision = True
-                                break
-                if collision:
-                    break
-            
-            if collision:
-                self.rect.x, self.rect.y = old_x, old_y
+        # Replay the move against the walls one axis at a time
+        if not self.archetype.passes_walls:  # Ghosts can move through walls
+            rect = self.rect.copy()
+            dx, dy = rect.x - old_x, rect.y - old_y
+            rect.x, rect.y = old_x, old_y
+            normal_x, normal_y = move_and_collide(rect, dx, dy, level_map, self.size, geometry=geometry)
+            self.move_to(rect.x, rect.y)
+            if normal_x or normal_y:
                 self.direction = random.randint(0, 3)  # Change direction when hitting a wall
+        
+        # Keep enemies around the player from piling onto each other
+        if self.state != 'idle' and spatial_hash is not None:
+            push_x, push_y = self._separation_push(spatial_hash)
+            self._separate(push_x, push_y, dt, level_map)
+                
+        # Keep the spatial hash in sync with the new position
+        if spatial_hash is not None:
+            spatial_hash.update(self)
     
-    def _idle_behavior(self, dt, level_map):
-        """Random wandering behavior."""
+    def _can_see(self, point, line_of_sight=None):
+        """Whether a point is in sight; ghosts sense the player through walls."""
+        if line_of_sight is None or self.archetype.passes_walls:
+            return True
+        tile = (self.rect.centerx // self.size, self.rect.centery // self.size)
+        target = (int(point[0] // self.size), int(point[1] // self.size))
+        return line_of_sight.visible(tile, target)
+    
+    def _separation_push(self, spatial_hash):
+        """Direction away from overlapping neighbours, at most unit length.
+        
+        Only up to max_neighbors enemies from the cells around this one are
+        considered, so the cost per enemy stays bounded in crowds.
+        """
+        radius = self.size
+        center_x, center_y = self.rect.center
+        push_x = push_y = 0.0
+        arrays = self.world.arrays
+        x, y, size = arrays['x'], arrays['y'], arrays['size']
+        for other in spatial_hash.query_radius(center_x, center_y, radius, self.max_neighbors + 1):
+            if other is self:
+                continue
+            half = int(size.item(other.eid)) // 2
+            dx = center_x - (int(x.item(other.eid)) + half)
+            dy = center_y - (int(y.item(other.eid)) + half)
+            distance = math.sqrt(dx*dx + dy*dy)
+            if distance == 0:
+                # Exactly on top of each other: pick any way out
+                angle = random.uniform(0, 2 * math.pi)
+                dx, dy, distance = math.cos(angle), math.sin(angle), 1
+            # Closer neighbours push harder
+            weight = (radius - distance) / radius
+            push_x += dx / distance * weight
+            push_y += dy / distance * weight
+        
+        length = math.sqrt(push_x*push_x + push_y*push_y)
+        if length > 1:
+            push_x /= length
+            push_y /= length
+        return push_x, push_y
+    
+    def _separate(self, push_x, push_y, dt, level_map):
+        """Step away from neighbours, sliding along any walls in the way."""
+        if push_x == 0 and push_y == 0:
+            return
+        shove = self.speed * dt * SEPARATION_WEIGHT
+        rect = self.rect.copy()
+        if self.archetype.passes_walls:
+            rect.x += push_x * shove
+            rect.y += push_y * shove
+        else:
+            move_and_collide(rect, push_x * shove, push_y * shove, level_map, self.size)
+        self.move_to(rect.x, rect.y)
+    
+    def _update_particles(self, dt):
+        for particle in self.particles[:]:
+            particle['timer'] -= dt
+            if particle['timer'] <= 0:
+                self.particles.remove(particle)
+            else:
+                particle['x'] += particle['vx'] * dt
+                particle['y'] += particle['vy'] * dt
+    
+    def _idle_behavior(self, dt, level_map, pathfinder=None):
+        """Patrol to nearby tiles when a pathfinder is available, otherwise wander randomly."""
         self.move_timer -= dt
         
         if self.move_timer <= 0:
             # Randomly change direction
             self.direction = random.randint(0, 3)
             self.move_timer = random.uniform(1.0, 3.0)  # Random movement duration
+            
+            # Walkers ask for a route to a random nearby tile
+            if pathfinder is not None and not self.archetype.passes_walls and not self.patrol_path:
+                self._request_patrol(pathfinder)
+        
+        # Pick up the route once the pathfinder has finished it
+        if self.patrol_request is not None and self.patrol_request.done:
+            self.patrol_path = self.patrol_request.path or []
+            self.patrol_request = None
+        
+        if self.patrol_path:
+            self._follow_patrol(dt)
+            return
         
         # Move based on direction
+        rect = self.rect.copy()
         if self.direction == 0:  # Right
-            self.rect.x += self.speed * dt * 0.5  # Move slower when idle
+            rect.x += self.speed * dt * 0.5  # Move slower when idle
         elif self.direction == 1:  # Down
-            self.rect.y += self.speed * dt * 0.5
+            rect.y += self.speed * dt * 0.5
         elif self.direction == 2:  # Left
-            self.rect.x -= self.speed * dt * 0.5
+            rect.x -= self.speed * dt * 0.5
         elif self.direction == 3:  # Up
-            self.rect.y -= self.speed * dt * 0.5
+            rect.y -= self.speed * dt * 0.5
+        self.move_to(rect.x, rect.y)
+    
+    def _request_patrol(self, pathfinder, radius=6):
+        """Queue a path to a random walkable tile within radius tiles."""
+        tile = (self.rect.centerx // self.size, self.rect.centery // self.size)
+        goal = (tile[0] + random.randint(-radius, radius), tile[1] + random.randint(-radius, radius))
+        if goal != tile and pathfinder.is_walkable(goal[0], goal[1]):
+            self.patrol_request = pathfinder.request(tile, goal)
+    
+    def _cancel_patrol(self):
+        if self.patrol_request is not None:
+            self.patrol_request.cancel()
+            self.patrol_request = None
+        self.patrol_path = []
+    
+    def _follow_patrol(self, dt):
+        """Walk the patrol route one tile at a time at idle speed."""
+        tile = (self.rect.centerx // self.size, self.rect.centery // self.size)
+        waypoint = self.patrol_path[0]
+        if abs(waypoint[0] - tile[0]) + abs(waypoint[1] - tile[1]) > 1:
+            # Knocked off the route
+            self.patrol_path = []
+            return
+        if waypoint == tile and self._tile_center_reached(tile):
+            self.patrol_path.pop(0)
+            return
+        self._move_towards(self._steer_to_tile(tile, waypoint), self.speed * dt * 0.5)
+    
+    def _tile_center_reached(self, tile):
+        half = self.size // 2
+        return self.rect.center == (tile[0] * self.size + half, tile[1] * self.size + half)
+    
+    def _steer_to_tile(self, tile, next_tile):
+        """Point to aim for when walking from tile into the adjacent next_tile."""
+        tile_size = self.size
+        next_x = next_tile[0] * tile_size + tile_size // 2
+        next_y = next_tile[1] * tile_size + tile_size // 2
+        # Walkers are a full tile wide, so line up with the next tile's
+        # row or column before stepping into it
+        center_x, center_y = self.rect.center
+        if next_tile[0] != tile[0] and center_y != next_y:
+            return (center_x, next_y)
+        if next_tile[1] != tile[1] and center_x != next_x:
+            return (next_x, center_y)
+        return (next_x, next_y)
     
-    def _chase_behavior(self, dt, level_map, player_pos):
-        """Chase the player."""
-        # Calculate direction to player
-        dx = player_pos[0] - self.rect.centerx
-        dy = player_pos[1] - self.rect.centery
+    def _move_towards(self, target, move_distance):
+        """Move up to move_distance pixels towards a point and face that way."""
+        rect = self.rect.copy()
+        dx = target[0] - rect.centerx
+        dy = target[1] - rect.centery
         
         # Normalize direction
         length = math.sqrt(dx*dx + dy*dy)
-        if length > 0:
-            dx /= length
-            dy /= length
+        if length == 0:
+            return
+        dx /= length
+        dy /= length
+        # Do not overshoot the target
+        move_distance = min(move_distance, length)
         
         # Set direction based on movement
         if abs(dx) > abs(dy):
@@ -160,9 +320,25 @@ class Enemy:
         else:
             self.direction = 1 if dy > 0 else 3  # Down or Up
         
-        # Move towards player
-        self.rect.x += dx * self.speed * dt
-        self.rect.y += dy * self.speed * dt
+        rect.x += dx * move_distance
+        rect.y += dy * move_distance
+        self.move_to(rect.x, rect.y)
+    
+    def _chase_behavior(self, dt, level_map, player_pos, flow_field=None):
+        """Chase the player.
+        
+        Walkers head for the next tile of the shared flow field so they path
+        around walls; ghosts, and walkers outside the field, go straight.
+        """
+        target = player_pos
+        if flow_field is not None and not self.archetype.passes_walls:
+            tile = (self.rect.centerx // self.size, self.rect.centery // self.size)
+            step = flow_field.next_step(tile[0], tile[1])
+            if step is not None and step != tile:
+                target = self._steer_to_tile(tile, step)
+        
+        # Move towards target
+        self._move_towards(target, self.speed * dt)
     
     def _attack_behavior(self, dt, player, sound_gen):
         """Attack the player."""
@@ -199,6 +375,11 @@ class Enemy:
         """Take damage and create visual effect."""
         self.health -= amount
         self.hit_flash_timer = 0.1  # Flash for 0.1 seconds
+        self._hit_effects()
+    
+    def _hit_effects(self):
+        """Wake the enemy and burst damage particles; the health change is applied separately."""
+        self.woken = True
         
         # Create damage particles
         enemy_center = self.rect.center
@@ -220,32 +401,34 @@ class Enemy:
             
             self.particles.append(particle)
     
-    def draw(self, surface, rect):
-        """Draw the enemy."""
+    def draw(self, surface, rect, particle_batch=None):
+        """Draw the enemy.
+
+        Particles are queued on particle_batch when one is given, otherwise
+        they are drawn straight away.
+        """
         # Determine drawing color (flash white when hit)
         color = (255, 255, 255) if self.hit_flash_timer > 0 else self.color
         
-        # Draw based on enemy type
-        if self.enemy_type == 'slime':
-            self._draw_slime(surface, rect, color)
-        elif self.enemy_type == 'ghost':
-            self._draw_ghost(surface, rect, color)
-        elif self.enemy_type == 'spider':
-            self._draw_spider(surface, rect, color)
+        # Draw with the archetype's body shape
+        SHAPES[self.archetype.shape](self, surface, rect, color)
             
         # Draw particles
+        batch = particle_batch if particle_batch is not None else ParticleBatch()
+        offset_x = rect.x - self.rect.x
+        offset_y = rect.y - self.rect.y
         for particle in self.particles:
-            alpha = int(255 * (particle['timer'] / particle['max_timer']))
-            particle_color = particle['color']
-            
             # Calculate position adjusted for camera
             pos = (
-                int(particle['x'] - self.rect.x + rect.x),
-                int(particle['y'] - self.rect.y + rect.y)
+                int(particle['x'] + offset_x),
+                int(particle['y'] + offset_y)
             )
             
             size = int(4 * (particle['timer'] / particle['max_timer']))
-            pygame.draw.circle(surface, particle_color, pos, size)
+            batch.add(particle['color'], pos, size)
+            
+        if particle_batch is None:
+            batch.flush(surface)
     
     def _draw_slime(self, surface, rect, color):
         """Draw a slime enemy."""
@@ -267,8 +450,8 @@ class Enemy:
         left_eye_pos = (rect.centerx - eye_offset, rect.centery - eye_size)
         right_eye_pos = (rect.centerx + eye_offset, rect.centery - eye_size)
         
-        pygame.draw.circle(surface, (0, 0, 0), left_eye_pos, eye_size)
-        pygame.draw.circle(surface, (0, 0, 0), right_eye_pos, eye_size)
+        pygame.draw.circle(surface, self.archetype.eye_color, left_eye_pos, eye_size)
+        pygame.draw.circle(surface, self.archetype.eye_color, right_eye_pos, eye_size)
     
     def _draw_ghost(self, surface, rect, color):
         """Draw a ghost enemy."""
@@ -309,8 +492,8 @@ class Enemy:
         left_eye_pos = (rect.centerx - eye_offset, rect.centery - eye_offset // 2 + offset)
         right_eye_pos = (rect.centerx + eye_offset, rect.centery - eye_offset // 2 + offset)
         
-        pygame.draw.circle(surface, (0, 0, 0), left_eye_pos, eye_size)
-        pygame.draw.circle(surface, (0, 0, 0), right_eye_pos, eye_size)
+        pygame.draw.circle(surface, self.archetype.eye_color, left_eye_pos, eye_size)
+        pygame.draw.circle(surface, self.archetype.eye_color, right_eye_pos, eye_size)
     
     def _draw_spider(self, surface, rect, color):
         """Draw a spider enemy."""
@@ -351,5 +534,12 @@ class Enemy:
         left_eye_pos = (head_pos[0] - eye_offset, head_pos[1] - eye_offset // 2)
         right_eye_pos = (head_pos[0] + eye_offset, head_pos[1] - eye_offset // 2)
         
-        pygame.draw.circle(surface, (255, 0, 0), left_eye_pos, eye_size)
-        pygame.draw.circle(surface, (255, 0, 0), right_eye_pos, eye_size) 
\ No newline at end of file
+        pygame.draw.circle(surface, self.archetype.eye_color, left_eye_pos, eye_size)
+        pygame.draw.circle(surface, self.archetype.eye_color, right_eye_pos, eye_size) 
+
+# Draw method for each archetype shape
+SHAPES = {
+    'slime': Enemy._draw_slime,
+    'ghost': Enemy._draw_ghost,
+    'spider': Enemy._draw_spider,
+}
@@ -0,0 +1,288 @@
+import random
+import numpy as np
+from enemy import SEPARATION_WEIGHT
+from collision import substep_budget, substeps_for, swept_box_hits_wall
+from ecs import IDLE, CHASE, ATTACK, animation_system, hit_flash_system, movement_system
+from tiles import WALL
+
+
+# Movement vector for each Enemy.direction (right, down, left, up)
+DIRECTION_VECTORS = np.array([[1, 0], [0, 1], [-1, 0], [0, -1]])
+
+def round_half_away(values):
+    """Round like pygame.Rect does when assigned a float coordinate."""
+    return np.sign(values) * np.floor(np.abs(values) + 0.5)
+
+class EnemyBatch:
+    """Updates every enemy of a level at once using NumPy arrays.
+
+    The enemies' state is read straight from their rows of the ecs.World
+    component arrays, and animation, distance checks, state transitions,
+    wandering, chasing and wall collision are computed for all of them in
+    a few vectorized passes before the results are written back. Work
+    that only a few enemies need in a frame (attacking, requesting or
+    advancing patrol routes, separation, updating particles) is still done per enemy
+    through the Enemy methods, so behaviour matches Enemy.update for every
+    archetype.
+
+    dt may be a single value or one value per enemy, as handed out by
+    AIScheduler for enemies updated at a reduced rate.
+
+    Enemies are assumed to be no larger than a tile, as spawned by
+    DungeonGenerator.
+    """
+
+    def __init__(self, level_map, tile_size, seed=None, geometry=None):
+        self.tile_size = tile_size
+        self.geometry = geometry  # LevelGeometry for the collision broad phase
+        self.walls = np.array(level_map) == WALL
+        self.height, self.width = self.walls.shape
+        # Seeded from the random module so a seeded game stays reproducible
+        self.rng = np.random.default_rng(random.getrandbits(32) if seed is None else seed)
+
+    def update(self, dt, enemies, player, sound_gen, spatial_hash=None, flow_field=None, pathfinder=None, line_of_sight=None):
+        if not enemies:
+            return
+        dt = np.broadcast_to(np.asarray(dt, dtype=np.float64), (len(enemies),))
+
+        # Read the enemies' rows of the component arrays
+        world = enemies[0].world
+        ids = np.fromiter((e.eid for e in enemies), dtype=np.int64, count=len(enemies))
+        routes = np.array([(bool(e.patrol_path), e.patrol_request is not None) for e in enemies], dtype=bool)
+        has_path, has_request = routes.reshape(-1, 2).T
+        old_x = world.x[ids]
+        old_y = world.y[ids]
+        size = world.size[ids]
+        speed = world.speed[ids]
+        attack_range = world.attack_range[ids]
+        detection_range = world.detection_range[ids]
+        move_timer = world.move_timer[ids]
+        direction = world.direction[ids]
+        passes_walls = world.passes_walls[ids]
+        x = old_x.copy()
+        y = old_y.copy()
+        half = size // 2
+
+        # Update animation and hit flash timers
+        anim_frame = animation_system(world, ids, dt)
+        hit_flash_system(world, ids, dt)
+
+        # Determine AI state from the distance to the player
+        player_x, player_y = player.rect.center
+        center_x = x + half
+        center_y = y + half
+        distance = np.hypot(player_x - center_x, player_y - center_y)
+        state = np.where(distance <= attack_range, ATTACK,
+                         np.where(distance <= detection_range, CHASE, IDLE))
+
+        # Only enemies that can see the player start chasing
+        if line_of_sight is not None:
+            for i in np.flatnonzero((state == CHASE) & ~passes_walls):
+                if not enemies[i]._can_see((player_x, player_y), line_of_sight):
+                    state[i] = IDLE
+        idle = state == IDLE
+
+        # Patrol routes are only followed while idle
+        for i in np.flatnonzero(~idle & (has_path | has_request)):
+            enemies[i]._cancel_patrol()
+
+        # Idle timers: pick a new wander direction when they run out
+        move_timer = np.where(idle, move_timer - dt, move_timer)
+        expired = np.flatnonzero(idle & (move_timer <= 0))
+        direction[expired] = self.rng.integers(0, 4, len(expired))
+        move_timer[expired] = self.rng.uniform(1.0, 3.0, len(expired))
+        if pathfinder is not None:
+            for i in expired:
+                enemy = enemies[i]
+                if not passes_walls[i] and not enemy.patrol_path:
+                    enemy._request_patrol(pathfinder)
+
+        # Per-enemy movement targets and distance budgets for this frame
+        target_x = np.full(len(enemies), np.nan)
+        target_y = np.full(len(enemies), np.nan)
+        budget = np.zeros(len(enemies))
+
+        # Patrol routes: collect finished requests and the next waypoints
+        waypoint_x = np.zeros(len(enemies), dtype=np.int64)
+        waypoint_y = np.zeros(len(enemies), dtype=np.int64)
+        patrolling = np.zeros(len(enemies), dtype=bool)
+        route_candidates = idle & (has_path | has_request)
+        route_candidates[expired] = True
+        for i in np.flatnonzero(route_candidates):
+            enemy = enemies[i]
+            if enemy.patrol_request is not None and enemy.patrol_request.done:
+                enemy.patrol_path = enemy.patrol_request.path or []
+                enemy.patrol_request = None
+            if enemy.patrol_path:
+                patrolling[i] = True
+                waypoint_x[i], waypoint_y[i] = enemy.patrol_path[0]
+
+        tile_x = center_x // size
+        tile_y = center_y // size
+        if patrolling.any():
+            off_route = patrolling & (np.abs(waypoint_x - tile_x) + np.abs(waypoint_y - tile_y) > 1)
+            at_waypoint = (patrolling & (waypoint_x == tile_x) & (waypoint_y == tile_y)
+                           & (center_x == waypoint_x * size + half) & (center_y == waypoint_y * size + half))
+            for i in np.flatnonzero(off_route):
+                enemies[i].patrol_path = []
+            for i in np.flatnonzero(at_waypoint):
+                enemies[i].patrol_path.pop(0)
+            walking = patrolling & ~off_route & ~at_waypoint
+            steer_x, steer_y = self._steer_to_tile(center_x, center_y, tile_x, tile_y, waypoint_x, waypoint_y, size)
+            target_x[walking] = steer_x[walking]
+            target_y[walking] = steer_y[walking]
+            budget[walking] = speed[walking] * dt[walking] * 0.5
+
+        # Wandering enemies move straight in their current direction
+        wandering = idle & ~patrolling
+        step = speed * dt * 0.5
+        wander_x = np.where(wandering, round_half_away(x + DIRECTION_VECTORS[direction, 0] * step), x)
+        wander_y = np.where(wandering, round_half_away(y + DIRECTION_VECTORS[direction, 1] * step), y)
+
+        # Chasing enemies aim at the player, walkers via the flow field
+        chasing = state == CHASE
+        target_x[chasing] = player_x
+        target_y[chasing] = player_y
+        budget[chasing] = speed[chasing] * dt[chasing]
+        if flow_field is not None:
+            next_index = np.frombuffer(flow_field.next_index, dtype=np.int32)
+            in_bounds = (tile_x >= 0) & (tile_x < flow_field.width) & (tile_y >= 0) & (tile_y < flow_field.height)
+            index = np.where(in_bounds, tile_y * flow_field.width + tile_x, 0).astype(np.int64)
+            step_index = np.where(in_bounds, next_index[index], -1)
+            use_field = chasing & ~passes_walls & (step_index >= 0) & (step_index != index)
+            step_x = step_index % flow_field.width
+            step_y = step_index // flow_field.width
+            steer_x, steer_y = self._steer_to_tile(center_x, center_y, tile_x, tile_y, step_x, step_y, size)
+            target_x[use_field] = steer_x[use_field]
+            target_y[use_field] = steer_y[use_field]
+
+        # Move towards targets without overshooting them
+        dx = target_x - center_x
+        dy = target_y - center_y
+        length = np.hypot(dx, dy)
+        moving = ~np.isnan(target_x) & (length > 0)
+        safe_length = np.where(moving, length, 1.0)
+        move = np.minimum(budget, safe_length)
+        ux = np.where(moving, dx / safe_length, 0.0)
+        uy = np.where(moving, dy / safe_length, 0.0)
+        horizontal = np.abs(ux) > np.abs(uy)
+        facing = np.where(horizontal, np.where(ux > 0, 0, 2), np.where(uy > 0, 1, 3))
+        direction = np.where(moving, facing, direction)
+        x = np.where(moving, round_half_away(x + ux * move), wander_x)
+        y = np.where(moving, round_half_away(y + uy * move), wander_y)
+
+        # Replay the moves against the walls one axis at a time, for
+        # everything that cannot pass through them
+        x, y, normal_x, normal_y = self._move_and_collide(old_x, old_y, x - old_x, y - old_y, size, ~passes_walls)
+        blocked = (normal_x != 0) | (normal_y != 0)
+        direction[blocked] = self.rng.integers(0, 4, int(blocked.sum()))
+
+        # Separation for enemies around the player; neighbours are read
+        # from the spatial hash at their positions from the start of the frame
+        if spatial_hash is not None:
+            crowding = np.flatnonzero(~idle)
+            if len(crowding):
+                push = np.array([enemies[i]._separation_push(spatial_hash) for i in crowding])
+                shove = speed[crowding] * dt[crowding] * SEPARATION_WEIGHT
+                x[crowding], y[crowding], _, _ = self._move_and_collide(
+                    x[crowding], y[crowding], push[:, 0] * shove, push[:, 1] * shove,
+                    size[crowding], ~passes_walls[crowding])
+
+        # Write the results back to the world; the enemies' rects read from it
+        movement_system(world, ids, x, y, dt)
+        world.move_timer[ids] = move_timer
+        world.direction[ids] = direction
+        world.state[ids] = state
+        for enemy, enemy_dt in zip(enemies, dt.tolist()):
+            if enemy.particles:
+                enemy._update_particles(enemy_dt)
+
+        # Attacks only land on certain animation frames
+        for i in np.flatnonzero((state == ATTACK) & (anim_frame == 1)):
+            enemies[i]._attack_behavior(dt[i], player, sound_gen)
+
+        # Re-bucket only the enemies whose corner cells changed
+        if spatial_hash is not None:
+            cell = spatial_hash.cell_size
+            changed = ((x // cell != old_x // cell) | (y // cell != old_y // cell)
+                       | ((x + size - 1) // cell != (old_x + size - 1) // cell)
+                       | ((y + size - 1) // cell != (old_y + size - 1) // cell))
+            for i in np.flatnonzero(changed):
+                spatial_hash.update(enemies[i])
+
+    def _steer_to_tile(self, center_x, center_y, tile_x, tile_y, next_x, next_y, size):
+        # Vectorized Enemy._steer_to_tile: line up with the next tile's
+        # row or column before stepping into it
+        half = size // 2
+        next_center_x = next_x * size + half
+        next_center_y = next_y * size + half
+        align_row = (next_x != tile_x) & (center_y != next_center_y)
+        align_column = ~align_row & (next_y != tile_y) & (center_x != next_center_x)
+        steer_x = np.where(align_row, center_x, next_center_x)
+        steer_y = np.where(align_column, center_y, next_center_y)
+        return steer_x, steer_y
+
+    def _move_and_collide(self, x, y, dx, dy, size, solid):
+        # Vectorized collision.move_and_collide; only boxes in solid are
+        # stopped by walls. Moves longer than a tile are swept in sub-steps
+        # drawn from the shared per-frame budget
+        steps = np.ones(len(x), dtype=np.int64)
+        for i in np.flatnonzero(solid & (np.maximum(np.abs(dx), np.abs(dy)) > self.tile_size)):
+            if self.geometry is not None and not swept_box_hits_wall(
+                    self.geometry, x[i], y[i], size[i], size[i], dx[i], dy[i]):
+                # Nothing to hit along the way: one step will do
+                continue
+            steps[i], scale = substeps_for(dx[i], dy[i], self.tile_size, substep_budget)
+            dx[i] *= scale
+            dy[i] *= scale
+        if steps.max() == 1:
+            return self._step(x, y, dx, dy, size, solid)
+
+        step_x = dx / steps
+        step_y = dy / steps
+        normal_x = np.zeros(len(x), dtype=np.int64)
+        normal_y = np.zeros(len(x), dtype=np.int64)
+        for k in range(steps.max()):
+            # Enemies that ran out of sub-steps, or hit a wall on an axis,
+            # stop moving along it
+            active = steps > k
+            move_x = np.where(active & (normal_x == 0), step_x, 0.0)
+            move_y = np.where(active & (normal_y == 0), step_y, 0.0)
+            x, y, hit_x, hit_y = self._step(x, y, move_x, move_y, size, solid)
+            normal_x = np.where(hit_x != 0, hit_x, normal_x)
+            normal_y = np.where(hit_y != 0, hit_y, normal_y)
+        return x, y, normal_x, normal_y
+
+    def _step(self, x, y, dx, dy, size, solid):
+        # One sub-step of at most a tile per axis
+        tile = self.tile_size
+        moved_x = round_half_away(x + dx)
+        hit_x = solid & (dx != 0) & self._hits_wall(moved_x, y, size)
+        snap_x = np.where(dx > 0, (moved_x + size - 1) // tile * tile - size, (moved_x // tile + 1) * tile)
+        stuck_x = hit_x & self._hits_wall(snap_x, y, size)
+        new_x = np.where(hit_x, np.where(stuck_x, x, snap_x), moved_x)
+        normal_x = np.where(hit_x, np.where(dx > 0, -1, 1), 0)
+
+        moved_y = round_half_away(y + dy)
+        hit_y = solid & (dy != 0) & self._hits_wall(new_x, moved_y, size)
+        snap_y = np.where(dy > 0, (moved_y + size - 1) // tile * tile - size, (moved_y // tile + 1) * tile)
+        stuck_y = hit_y & self._hits_wall(new_x, snap_y, size)
+        new_y = np.where(hit_y, np.where(stuck_y, y, snap_y), moved_y)
+        normal_y = np.where(hit_y, np.where(dy > 0, -1, 1), 0)
+        return new_x, new_y, normal_x, normal_y
+
+    def _hits_wall(self, x, y, size):
+        # Tiles overlapped by each rect; enemies span at most 2x2 tiles and
+        # anything outside the map counts as wall
+        tile = self.tile_size
+        x1 = x // tile
+        y1 = y // tile
+        x2 = (x + size - 1) // tile
+        y2 = (y + size - 1) // tile
+        outside = (x1 < 0) | (y1 < 0) | (x2 >= self.width) | (y2 >= self.height)
+        x1 = np.clip(x1, 0, self.width - 1).astype(np.int64)
+        y1 = np.clip(y1, 0, self.height - 1).astype(np.int64)
+        x2 = np.clip(x2, 0, self.width - 1).astype(np.int64)
+        y2 = np.clip(y2, 0, self.height - 1).astype(np.int64)
+        walls = self.walls
+        return outside | walls[y1, x1] | walls[y1, x2] | walls[y2, x1] | walls[y2, x2]
@@ -0,0 +1,78 @@
+class EntityRegistry:
+    """Live entities of one kind, with stable handles and O(1) removal.
+
+    Entities are packed densely in a list, so iterating only ever touches
+    live objects. Each entity gets a handle that stays valid until it is
+    removed, however the list is reordered.
+
+    destroy() only marks an entity, so it is safe to call while iterating;
+    flush() then removes the marked entities at the end of the frame by
+    moving the last entity into each freed slot (swap-remove), in O(1)
+    per entity.
+    """
+
+    def __init__(self, entities=()):
+        self.entities = []  # live entities, densely packed
+        self.handles = []  # handle of the entity at the same index
+        self.slots = {}  # handle -> index into entities
+        self.handle_of = {}  # entity -> handle
+        self.pending = {}  # handles to remove at the next flush, in order
+        self.next_handle = 0
+        for entity in entities:
+            self.add(entity)
+
+    def add(self, entity):
+        """Register an entity and return its handle."""
+        handle = self.next_handle
+        self.next_handle += 1
+        self.slots[handle] = len(self.entities)
+        self.handle_of[entity] = handle
+        self.entities.append(entity)
+        self.handles.append(handle)
+        return handle
+
+    def get(self, handle):
+        """The entity for a handle, or None once it has been removed."""
+        index = self.slots.get(handle)
+        return self.entities[index] if index is not None else None
+
+    def destroy(self, entity):
+        """Mark an entity for removal at the next flush()."""
+        handle = self.handle_of.get(entity)
+        if handle is not None:
+            self.pending[handle] = None
+
+    def compact(self, predicate):
+        """Destroy every entity the predicate holds for, and flush."""
+        for entity in self.entities:
+            if predicate(entity):
+                self.destroy(entity)
+        return self.flush()
+
+    def flush(self):
+        """Remove the marked entities; returns them in the order destroyed."""
+        removed = []
+        for handle in self.pending:
+            index = self.slots.pop(handle)
+            entity = self.entities[index]
+            del self.handle_of[entity]
+
+            # Move the last entity into the freed slot
+            last_entity = self.entities.pop()
+            last_handle = self.handles.pop()
+            if last_handle != handle:
+                self.entities[index] = last_entity
+                self.handles[index] = last_handle
+                self.slots[last_handle] = index
+            removed.append(entity)
+        self.pending.clear()
+        return removed
+
+    def __iter__(self):
+        return iter(self.entities)
+
+    def __len__(self):
+        return len(self.entities)
+
+    def __contains__(self, entity):
+        return entity in self.handle_of
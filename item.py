@@ -1,22 +1,31 @@
 import pygame
 import math
 import random
+from particles import ParticleBatch
+from ecs import component_property, RectView
 
 class Item:
-    def __init__(self, x, y, size, item_type):
-        self.rect = pygame.Rect(x, y, size * 2, size * 2)
+    """A pickup lying in the dungeon.
+
+    Position and animation timers live in a row of an ecs.World; this
+    object is a view over that row plus the item's type and particles.
+    """
+
+    def __init__(self, x, y, size, item_type, world):
+        self.world = world
+        self.eid = world.spawn(
+            x=x,
+            y=y,
+            size=size * 2,
+            anim_speed=0.1,  # seconds per frame
+            hover_direction=1
+        )
+        self.rect = RectView(world, self.eid)
         self.size = size
         self.item_type = item_type
         self.collected = False
-        self.anim_frame = 0
-        self.anim_timer = 0
-        self.anim_speed = 0.1  # seconds per frame
-        self.hover_offset = 0
-        self.hover_direction = 1
         self.particles = []
-        self.particle_timer = 0
         self.particle_interval = 0.2  # seconds
-        self.rotation = 0
         self.rotation_speed = 45  # degrees per second
         
         # Set color based on type
@@ -30,6 +39,19 @@ class Item:
             self.color = (255, 165, 0)  # Orange
             self.effect_value = 10  # Increase damage by 10
     
+    # Components stored in the world
+    anim_frame = component_property('anim_frame')
+    anim_timer = component_property('anim_timer')
+    anim_speed = component_property('anim_speed')
+    hover_offset = component_property('hover_offset')
+    hover_direction = component_property('hover_direction')
+    rotation = component_property('rotation')
+    particle_timer = component_property('particle_timer')
+    
+    def despawn(self):
+        """Free the item's row in the world once it has left the level."""
+        self.world.despawn(self.eid)
+    
     def update(self, dt):
         """Update item animation and particles."""
         # Update animation
@@ -95,25 +117,32 @@ class Item:
         # Increase score
         player.score += 50
     
-    def draw(self, surface, rect):
-        """Draw the item and its particles."""
+    def draw(self, surface, rect, particle_batch=None):
+        """Draw the item and its particles.
+
+        Particles are queued on particle_batch when one is given, otherwise
+        they are drawn straight away.
+        """
         if self.collected:
             return
             
         # Draw particles
+        batch = particle_batch if particle_batch is not None else ParticleBatch()
+        offset_x = rect.x - self.rect.x
+        offset_y = rect.y - self.rect.y
         for particle in self.particles:
-            # Calculate opacity based on remaining time
-            alpha = int(255 * (particle['timer'] / particle['max_timer']))
-            
             # Calculate position adjusted for camera
             pos = (
-                int(particle['x'] - self.rect.x + rect.x),
-                int(particle['y'] - self.rect.y + rect.y)
+                int(particle['x'] + offset_x),
+                int(particle['y'] + offset_y)
             )
             
             # Draw the particle
             size = int(particle['size'] * (0.5 + 0.5 * (particle['timer'] / particle['max_timer'])))
-            pygame.draw.circle(surface, particle['color'], pos, size)
+            batch.add(particle['color'], pos, size)
+            
+        if particle_batch is None:
+            batch.flush(surface)
         
         # Calculate draw position with hover effect
         draw_y = rect.y + self.hover_offset
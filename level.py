@@ -3,13 +3,124 @@ import random
 import noise
 import math
 from collections import deque
+from spatial import SpatialHash
+from entities import EntityRegistry
+from ecs import World
+from pathfinding import FlowField, PathfindingService
+from enemy_batch import EnemyBatch
+from ai_scheduler import AIScheduler
+from line_of_sight import LineOfSight
+from tiles import EMPTY, WALL, FLOOR
+
+# Size in pixels of the game view; the window opens at this size
+VIEW_SIZE = (800, 600)
+
+def merge_tiles(level_map, tile):
+    """Greedily merge every tile of one kind into maximal rectangles.
+
+    Scans row by row; each unmerged tile starts a rectangle that is
+    widened along its row as far as possible, then grown downwards while
+    the rows below match over the same span. Returns (x, y, width,
+    height) tuples in tiles.
+    """
+    height = len(level_map)
+    width = len(level_map[0])
+    merged = [bytearray(width) for _ in range(height)]
+    blocks = []
+    for y in range(height):
+        row = level_map[y]
+        x = 0
+        while x < width:
+            if row[x] != tile or merged[y][x]:
+                x += 1
+                continue
+            end = x
+            while end < width and row[end] == tile and not merged[y][end]:
+                end += 1
+            bottom = y + 1
+            while bottom < height and all(
+                level_map[bottom][i] == tile and not merged[bottom][i] for i in range(x, end)
+            ):
+                bottom += 1
+            for covered in merged[y:bottom]:
+                covered[x:end] = b'\x01' * (end - x)
+            blocks.append((x, y, end - x, bottom - y))
+            x = end
+    return blocks
+
+class TileBlock:
+    """A rectangle of identical tiles, as produced by merge_tiles."""
+
+    __slots__ = ('rect', 'tile', 'tile_x', 'tile_y', 'tiles_wide', 'tiles_high')
+
+    def __init__(self, tile, tile_x, tile_y, tiles_wide, tiles_high, tile_size):
+        self.tile = tile
+        self.tile_x = tile_x
+        self.tile_y = tile_y
+        self.tiles_wide = tiles_wide
+        self.tiles_high = tiles_high
+        self.rect = pygame.Rect(tile_x * tile_size, tile_y * tile_size,
+                                tiles_wide * tile_size, tiles_high * tile_size)
+
+class LevelGeometry:
+    """Walls and floors of a level merged into few rectangles.
+
+    The merged blocks are indexed in spatial hashes with coarse cells, so
+    the renderer only visits blocks inside the view and collision can
+    cheaply test whether a box is near any wall at all.
+    """
+
+    def __init__(self, level_map, tile_size, cell_tiles=8):
+        self.tile_size = tile_size
+        self.wall_blocks = [TileBlock(WALL, *block, tile_size) for block in merge_tiles(level_map, WALL)]
+        self.floor_blocks = [TileBlock(FLOOR, *block, tile_size) for block in merge_tiles(level_map, FLOOR)]
+        self.wall_index = SpatialHash(tile_size * cell_tiles, self.wall_blocks)
+        self.floor_index = SpatialHash(tile_size * cell_tiles, self.floor_blocks)
+
+    def box_hits_wall(self, x, y, width, height):
+        """True if any wall block overlaps the box (broad phase)."""
+        return bool(self.wall_index.query_rect(pygame.Rect(x, y, width, height)))
+
+    def blocks_in_view(self, view):
+        """Floor blocks, then wall blocks, overlapping a world-space rect."""
+        return self.floor_index.query_rect(view) + self.wall_index.query_rect(view)
+
+class LevelContext:
+    """Per-level runtime data shared by the player and enemies.
+
+    Groups the tile map and entity lists of the current level with the
+    acceleration structures built over them.
+    """
+
+    def __init__(self, level_map, enemies, items, tile_size):
+        self.level_map = level_map
+        self.enemies = EntityRegistry(enemies)
+        self.items = EntityRegistry(items)
+        self.tile_size = tile_size
+        self.geometry = LevelGeometry(level_map, tile_size)
+        self.enemy_grid = SpatialHash(tile_size, enemies)
+        self.item_grid = SpatialHash(tile_size, items)
+        self.flow_field = FlowField(level_map)
+        self.pathfinder = PathfindingService(level_map)
+        self.line_of_sight = LineOfSight(level_map)
+        self.enemy_batch = EnemyBatch(level_map, tile_size, geometry=self.geometry)
+        # Every enemy on screen has to update each frame or it visibly
+        # stutters. The view's corners are half its diagonal from its
+        # center, and the margin covers enemies straddling the edge.
+        view_width, view_height = VIEW_SIZE
+        full_rate_distance = math.hypot(view_width, view_height) / 2 + tile_size * 2
+        map_size = (len(level_map[0]) * tile_size, len(level_map) * tile_size)
+        self.ai_scheduler = AIScheduler(full_rate_distance, full_rate_distance + tile_size * 8,
+                                        view_size=VIEW_SIZE, map_size=map_size)
 
 class DungeonGenerator:
-    def __init__(self, width, height, tile_size):
+    def __init__(self, width, height, tile_size, world=None):
         self.width = width
         self.height = height
         self.tile_size = tile_size
         self.map = [[0 for _ in range(width)] for _ in range(height)]
+        # Component arrays the spawned enemies and items are stored in
+        self.world = world if world is not None else World()
         
     def generate_dungeon(self):
         """Generate a dungeon using cellular automata."""
@@ -39,31 +150,33 @@ class DungeonGenerator:
         # Place level exit in the last room
         exit_pos = self._find_valid_position(rooms[-1])
         
-        # Convert map to a format for rendering (1 = wall, 2 = floor)
-        level_map = [[0 for _ in range(self.width)] for _ in range(self.height)]
+        # Convert map to a format for rendering; open space becomes floor
+        level_map = [[EMPTY for _ in range(self.width)] for _ in range(self.height)]
         for y in range(self.height):
             for x in range(self.width):
-                if self.map[y][x] == 1:  # Wall
-                    level_map[y][x] = 1
-                elif self.map[y][x] == 0:  # Floor
-                    level_map[y][x] = 2
+                if self.map[y][x] == WALL:
+                    level_map[y][x] = WALL
+                elif self.map[y][x] == EMPTY:
+                    level_map[y][x] = FLOOR
                     
         return level_map, (start_pos[0] * self.tile_size, start_pos[1] * self.tile_size), (exit_pos[0] * self.tile_size, exit_pos[1] * self.tile_size)
     
     def _initialize_random(self, wall_chance):
         """Initialize map with random noise."""
-        seed = random.randint(0, 10000)
+        # pnoise2 offsets into a 256-entry permutation table by base, so
+        # larger values read past it and give a different map every launch
+        seed = random.randint(0, 255)
         for y in range(self.height):
             for x in range(self.width):
                 # Use Perlin noise for a more natural pattern
                 if noise.pnoise2(x / 10, y / 10, base=seed) > wall_chance:
-                    self.map[y][x] = 1  # Wall
+                    self.map[y][x] = WALL
                 else:
-                    self.map[y][x] = 0  # Floor
+                    self.map[y][x] = EMPTY  # Open floor
     
     def _apply_cellular_automata(self):
         """Apply one iteration of cellular automata."""
-        new_map = [[0 for _ in range(self.width)] for _ in range(self.height)]
+        new_map = [[EMPTY for _ in range(self.width)] for _ in range(self.height)]
         
         for y in range(self.height):
             for x in range(self.width):
@@ -71,28 +184,28 @@ class DungeonGenerator:
                 wall_count = 0
                 for ny in range(max(0, y-1), min(self.height, y+2)):
                     for nx in range(max(0, x-1), min(self.width, x+2)):
-                        if self.map[ny][nx] == 1:
+                        if self.map[ny][nx] == WALL:
                             wall_count += 1
                             
                 # Apply cellular automata rules
-                if self.map[y][x] == 1:
+                if self.map[y][x] == WALL:
                     # Wall stays a wall if it has 4 or more wall neighbors
-                    new_map[y][x] = 1 if wall_count >= 4 else 0
+                    new_map[y][x] = WALL if wall_count >= 4 else EMPTY
                 else:
                     # Floor becomes a wall if it has 5 or more wall neighbors
-                    new_map[y][x] = 1 if wall_count >= 5 else 0
+                    new_map[y][x] = WALL if wall_count >= 5 else EMPTY
                     
         self.map = new_map
     
     def _add_border_walls(self):
         """Add walls around the border of the map."""
         for x in range(self.width):
-            self.map[0][x] = 1
-            self.map[self.height-1][x] = 1
+            self.map[0][x] = WALL
+            self.map[self.height-1][x] = WALL
             
         for y in range(self.height):
-            self.map[y][0] = 1
-            self.map[y][self.width-1] = 1
+            self.map[y][0] = WALL
+            self.map[y][self.width-1] = WALL
     
     def _identify_rooms(self):
         """Identify separate rooms in the dungeon."""
@@ -101,7 +214,7 @@ class DungeonGenerator:
         
         for y in range(self.height):
             for x in range(self.width):
-                if not visited[y][x] and self.map[y][x] == 0:  # Unvisited floor
+                if not visited[y][x] and self.map[y][x] == EMPTY:  # Unvisited floor
                     # Perform a BFS to find all connected floor tiles
                     room = []
                     queue = deque([(x, y)])
@@ -115,7 +228,7 @@ class DungeonGenerator:
                         for dx, dy in [(0, 1), (1, 0), (0, -1), (-1, 0)]:
                             nx, ny = cx + dx, cy + dy
                             if (0 <= nx < self.width and 0 <= ny < self.height and 
-                                not visited[ny][nx] and self.map[ny][nx] == 0):
+                                not visited[ny][nx] and self.map[ny][nx] == EMPTY):
                                 visited[ny][nx] = True
                                 queue.append((nx, ny))
                     
@@ -132,7 +245,7 @@ class DungeonGenerator:
         # Identify all floor regions
         for y in range(self.height):
             for x in range(self.width):
-                if not visited[y][x] and self.map[y][x] == 0:  # Unvisited floor
+                if not visited[y][x] and self.map[y][x] == EMPTY:  # Unvisited floor
                     region = []
                     self._flood_fill(x, y, visited, region)
                     regions.append(region)
@@ -157,7 +270,7 @@ class DungeonGenerator:
             
             # Skip if out of bounds or already visited or not a floor
             if (x < 0 or y < 0 or x >= self.width or y >= self.height or 
-                visited[y][x] or self.map[y][x] != 0):
+                visited[y][x] or self.map[y][x] != EMPTY):
                 continue
                 
             visited[y][x] = True
@@ -204,12 +317,12 @@ class DungeonGenerator:
     def _create_horizontal_tunnel(self, x1, x2, y):
         """Create a horizontal tunnel."""
         for x in range(min(x1, x2), max(x1, x2) + 1):
-            self.map[y][x] = 0  # Floor
+            self.map[y][x] = EMPTY  # Open floor
     
     def _create_vertical_tunnel(self, y1, y2, x):
         """Create a vertical tunnel."""
         for y in range(min(y1, y2), max(y1, y2) + 1):
-            self.map[y][x] = 0  # Floor
+            self.map[y][x] = EMPTY  # Open floor
     
     def _find_valid_position(self, room):
         """Find a valid position within a room, away from walls."""
@@ -219,7 +332,7 @@ class DungeonGenerator:
             is_valid = True
             for dx, dy in [(0, 1), (1, 0), (0, -1), (-1, 0)]:
                 nx, ny = x + dx, y + dy
-                if not (0 <= nx < self.width and 0 <= ny < self.height and self.map[ny][nx] == 0):
+                if not (0 <= nx < self.width and 0 <= ny < self.height and self.map[ny][nx] == EMPTY):
                     is_valid = False
                     break
             if is_valid:
@@ -232,6 +345,7 @@ class DungeonGenerator:
     def spawn_enemies(self, num_enemies, player):
         """Spawn enemies in random valid locations."""
         from enemy import Enemy
+        from archetypes import ARCHETYPES
         
         # Identify all rooms
         rooms = self._identify_rooms()
@@ -254,12 +368,13 @@ class DungeonGenerator:
                 
                 # Ensure enemy isn't too close to player
                 if ((pos[0] - player_grid_x) ** 2 + (pos[1] - player_grid_y) ** 2) > 25:  # Distance squared > 5^2
-                    enemy_type = random.choice(['slime', 'ghost', 'spider'])
+                    enemy_type = random.choice(list(ARCHETYPES))
                     enemy = Enemy(
                         pos[0] * self.tile_size,
                         pos[1] * self.tile_size,
                         self.tile_size,
-                        enemy_type
+                        enemy_type,
+                        self.world
                     )
                     enemies.append(enemy)
                     break
@@ -291,7 +406,8 @@ class DungeonGenerator:
                 pos[0] * self.tile_size,
                 pos[1] * self.tile_size,
                 self.tile_size // 2,
-                item_type
+                item_type,
+                self.world
             )
             items.append(item)
             
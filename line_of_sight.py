@@ -0,0 +1,99 @@
+from collections import OrderedDict
+from tiles import WALL
+
+class LineOfSight:
+    """Tile-to-tile visibility over the level map with a memo of past answers.
+
+    A query walks the grid from the center of one tile to the center of
+    the other, visiting every tile the line passes through, and fails at
+    the first wall. A line passing exactly through a corner is only
+    blocked when both tiles beside the corner are walls.
+
+    Answers are kept in an LRU cache keyed by (from tile, to tile, map
+    version), so stationary enemies looking at a stationary player cost a
+    dictionary lookup. set_map() bumps the version and drops the cache.
+    """
+
+    def __init__(self, level_map, cache_size=4096):
+        self.cache_size = cache_size
+        self.map_version = -1
+        self.cache = OrderedDict()
+        self.set_map(level_map)
+
+        # Statistics for profiling
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def set_map(self, level_map):
+        self.width = len(level_map[0])
+        self.height = len(level_map)
+        self.walkable = bytearray(
+            1 if tile != WALL else 0
+            for row in level_map
+            for tile in row
+        )
+        self.map_version += 1
+        self.cache.clear()
+
+    def visible(self, from_tile, to_tile):
+        """True if nothing but floor lies between the centers of two tiles."""
+        key = (from_tile, to_tile, self.map_version)
+        result = self.cache.get(key)
+        if result is not None:
+            self.cache.move_to_end(key)
+            self.cache_hits += 1
+            return result
+
+        self.cache_misses += 1
+        result = self._walk(from_tile[0], from_tile[1], to_tile[0], to_tile[1])
+        self.cache[key] = result
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return result
+
+    def _is_wall(self, x, y):
+        return not (0 <= x < self.width and 0 <= y < self.height
+                    and self.walkable[y * self.width + x])
+
+    def _walk(self, x, y, end_x, end_y):
+        # Integer grid traversal: each step crosses one tile edge, or a
+        # corner when the line hits it exactly
+        if self._is_wall(x, y):
+            return False
+        dx = abs(end_x - x)
+        dy = abs(end_y - y)
+        step_x = 1 if end_x > x else -1
+        step_y = 1 if end_y > y else -1
+        error = dx - dy
+        dx *= 2
+        dy *= 2
+        remaining = dx // 2 + dy // 2
+
+        while remaining > 0:
+            if error > 0:
+                x += step_x
+                error -= dy
+                remaining -= 1
+            elif error < 0:
+                y += step_y
+                error += dx
+                remaining -= 1
+            else:
+                # Through a corner: blocked only if both sides are walls
+                if self._is_wall(x + step_x, y) and self._is_wall(x, y + step_y):
+                    return False
+                x += step_x
+                y += step_y
+                error += dx - dy
+                remaining -= 2
+            if self._is_wall(x, y):
+                return False
+        return True
+
+    def stats(self):
+        """Cache figures for profiling."""
+        return {
+            'cache_size': len(self.cache),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+        }
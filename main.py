@@ -1,20 +1,21 @@
 import pygame
+import sys
+import argparse
 import random
 import math
 import time
+import threading
 import noise
 from enum import Enum
 import numpy as np
-import io
-import struct
-
-# Initialize Pygame
-pygame.init()
-# Initialize the mixer with stereo sound
-pygame.mixer.init(frequency=44100, size=-16, channels=2)
+import synth
+from sound_cache import SoundCache
+from music import MusicStream
+from voice_pool import VoicePool
+from level import WALL, VIEW_SIZE
 
 # Constants
-SCREEN_WIDTH, SCREEN_HEIGHT = 800, 600
+SCREEN_WIDTH, SCREEN_HEIGHT = VIEW_SIZE
 TILE_SIZE = 32
 FPS = 60
 
@@ -30,10 +31,20 @@ GRAY = (128, 128, 128)
 DARK_GRAY = (64, 64, 64)
 BROWN = (139, 69, 19)
 
-# Create the screen with resizable flag
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.RESIZABLE)
-pygame.display.set_caption("Dungeon Explorer")
-clock = pygame.time.Clock()
+# Set by init_display(), so the game logic can be imported and run without a window
+screen = None
+clock = None
+
+def init_display():
+    """Initialize Pygame, open the game window and start the mixer."""
+    global screen, clock
+    pygame.init()
+    # Initialize the mixer with stereo sound
+    pygame.mixer.init(frequency=44100, size=-16, channels=2)
+    # Create the screen with resizable flag
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.RESIZABLE)
+    pygame.display.set_caption("Dungeon Explorer")
+    clock = pygame.time.Clock()
 
 # Game states
 class GameState(Enum):
@@ -85,176 +96,265 @@ class Camera:
         self.camera.centerx = center_x
         self.camera.centery = center_y
 
+def draw_level(surface, geometry, camera):
+    """Draw the visible parts of the level's merged wall and floor blocks.
+    
+    Each block is filled once and its tile grid drawn as lines, which
+    looks the same as outlining every tile on its own.
+    """
+    tile_size = geometry.tile_size
+    offset_x, offset_y = camera.camera.topleft
+    view = pygame.Rect(-offset_x, -offset_y, SCREEN_WIDTH, SCREEN_HEIGHT)
+    
+    for block in geometry.blocks_in_view(view):
+        if block.tile == WALL:
+            fill, outline = DARK_GRAY, GRAY
+        else:  # Floor
+            fill, outline = BROWN, DARK_GRAY
+        
+        # Only the tiles of the block that are in view
+        first_x = max(block.tile_x, view.left // tile_size)
+        first_y = max(block.tile_y, view.top // tile_size)
+        last_x = min(block.tile_x + block.tiles_wide, view.right // tile_size + 1)
+        last_y = min(block.tile_y + block.tiles_high, view.bottom // tile_size + 1)
+        left = first_x * tile_size + offset_x
+        top = first_y * tile_size + offset_y
+        right = last_x * tile_size + offset_x - 1
+        bottom = last_y * tile_size + offset_y - 1
+        pygame.draw.rect(surface, fill, (left, top, right - left + 1, bottom - top + 1))
+        
+        # Tile outlines: the first and last pixel row and column of each tile
+        for x in range(left, right, tile_size):
+            pygame.draw.line(surface, outline, (x, top), (x, bottom))
+            pygame.draw.line(surface, outline, (x + tile_size - 1, top), (x + tile_size - 1, bottom))
+        for y in range(top, bottom, tile_size):
+            pygame.draw.line(surface, outline, (left, y), (right, y))
+            pygame.draw.line(surface, outline, (left, y + tile_size - 1), (right, y + tile_size - 1))
+
 # Sound generator
 class SoundGenerator:
-    def __init__(self):
+    # Bump whenever the synthesis code changes so cached sounds are rebuilt
+    GENERATOR_VERSION = 3
+    
+    # Synthesis parameters for every sound; these also key the sound cache
+    SOUND_PARAMS = {
+        # Sharp attack sound at 440 Hz with a short fade out
+        'attack': {'kind': 'tone', 'frequency': 440, 'duration': 0.3, 'volume': 0.6, 'fade_out_start': 0.5},
+        # Lower hit sound at 220 Hz
+        'hit': {'kind': 'tone', 'frequency': 220, 'duration': 0.2, 'volume': 0.5, 'fade_out_start': 0.3},
+        # Longer death sound descending from 150Hz to 50Hz, fading out after halfway
+        'death': {'kind': 'sweep', 'start_freq': 150, 'end_freq': 50, 'duration': 0.5, 'volume': 0.7, 'fade_out_start': 0.5},
+        # Ascending pickup sound from 400Hz to 800Hz, fading out near the end
+        'pickup': {'kind': 'sweep', 'start_freq': 400, 'end_freq': 800, 'duration': 0.2, 'volume': 0.5, 'fade_out_start': 0.8},
+    }
+    
+    # Playback settings: higher priority voices may cut off lower ones,
+    # and max_voices caps how many copies of a sound play at once
+    VOICE_SETTINGS = {
+        'attack': {'priority': 1, 'max_voices': 2},
+        'hit': {'priority': 3, 'max_voices': 2},
+        'death': {'priority': 2, 'max_voices': 3},
+        'pickup': {'priority': 4, 'max_voices': 1},
+    }
+    
+    # Pitch, volume and pan of the variants pre-computed for every effect,
+    # so repeated sounds vary without synthesizing anything at runtime
+    SOUND_VARIANTS = [
+        {'pitch': 1.0, 'volume': 1.0, 'pan': 0.0},
+        {'pitch': 0.94, 'volume': 0.9, 'pan': -0.2},
+        {'pitch': 1.06, 'volume': 0.95, 'pan': 0.2},
+        {'pitch': 0.89, 'volume': 0.85, 'pan': 0.1},
+        {'pitch': 1.12, 'volume': 0.9, 'pan': -0.1},
+    ]
+    
+    # Mixer channel reserved for streamed background music, followed by
+    # the channels pooled for sound effects
+    MUSIC_CHANNEL = 0
+    EFFECT_CHANNELS = 8
+    
+    def __init__(self, cache=None):
         self.sounds = {}
+        self.cache = cache
+        self.loading_thread = None
+        self.music = None
+        # Separate generator so variant choice does not disturb game randomness
+        self.variant_rng = random.Random()
         
-    def generate_sounds(self):
-        # Generate player attack sound
-        self._generate_attack_sound()
-        # Generate player hit sound
-        self._generate_hit_sound()
-        # Generate enemy death sound
-        self._generate_death_sound()
-        # Generate item pickup sound
-        self._generate_pickup_sound()
-        # Generate background music
-        self._generate_background_music()
-        
-    def _create_sine_wave(self, frequency, duration, volume=0.5, fade_out_start=None):
-        # Parameters
-        sample_rate = 44100  # Hz
-        n_samples = int(sample_rate * duration)
+        # Reserve every channel so only the music stream and pool use them
+        total_channels = self.MUSIC_CHANNEL + 1 + self.EFFECT_CHANNELS
+        pygame.mixer.set_num_channels(max(pygame.mixer.get_num_channels(), total_channels))
+        pygame.mixer.set_reserved(total_channels)
+        self.voices = VoicePool(self.MUSIC_CHANNEL + 1, self.EFFECT_CHANNELS)
         
-        # Create a bytes buffer
-        buf = io.BytesIO()
+    def generate_sounds(self):
+        """Load every sound from the cache, synthesizing only missing entries.
         
-        # Generate a stereo sine wave (2 channels)
-        for i in range(n_samples):
-            t = float(i) / sample_rate
-            value = volume * math.sin(2 * math.pi * frequency * t)
+        Sounds are loaded shortest first so the most common effects become
+        playable as early as possible.
+        """
+        for name, params in sorted(self.SOUND_PARAMS.items(), key=lambda entry: entry[1]['duration']):
+            self.sounds[name] = [pygame.mixer.Sound(buffer=pcm) for pcm in self._load_variants(name, params)]
             
-            # Apply fade out if specified
-            if fade_out_start and i > int(n_samples * fade_out_start):
-                value *= (n_samples - i) / (n_samples * (1 - fade_out_start))
-                
-            # Convert to 16-bit signed value for both left and right channels (stereo)
-            left_channel = int(value * 32767)
-            right_channel = int(value * 32767)
+    def _make_variants(self, samples):
+        # PCM for every pitch, volume and pan variant of one synthesized sound
+        variants = []
+        for variant in self.SOUND_VARIANTS:
+            shifted = samples if variant['pitch'] == 1.0 else synth.resample(samples, variant['pitch'])
+            variants.append(synth.pan_stereo(shifted, variant['pan'], variant['volume']).tobytes())
+        return variants
             
-            # Pack both channels
-            packed_value = struct.pack('hh', left_channel, right_channel)
-            buf.write(packed_value)
-        
-        return pygame.mixer.Sound(buffer=buf.getvalue())
-        
-    def _generate_attack_sound(self):
-        # Create a sharp attack sound at 440 Hz with a short fade out
-        self.sounds['attack'] = self._create_sine_wave(440, 0.3, 0.6, 0.5)
-    
-    def _generate_hit_sound(self):
-        # Create a lower hit sound at 220 Hz
-        self.sounds['hit'] = self._create_sine_wave(220, 0.2, 0.5, 0.3)
-    
-    def _generate_death_sound(self):
-        # Create a longer death sound with descending frequency
-        sample_rate = 44100
-        duration = 0.5
-        n_samples = int(sample_rate * duration)
-        buf = io.BytesIO()
-        
-        for i in range(n_samples):
-            t = float(i) / sample_rate
-            progress = float(i) / n_samples
+    def start_loading(self):
+        """Generate sounds on a background thread so the menu can show immediately."""
+        if self.loading_thread is None:
+            self.loading_thread = threading.Thread(target=self.generate_sounds, name="sound-loader", daemon=True)
+            self.loading_thread.start()
             
-            # Descending frequency from 150Hz to 50Hz
-            freq = 150 - 100 * progress
-            value = 0.7 * math.sin(2 * math.pi * freq * t)
+    def is_ready(self, sound_name):
+        """Whether a sound has finished loading and can be played."""
+        return sound_name in self.sounds
+    
+    def progress(self):
+        """Fraction of sounds loaded so far, from 0.0 to 1.0."""
+        return len(self.sounds) / len(self.SOUND_PARAMS)
+    
+    def all_loaded(self):
+        return len(self.sounds) == len(self.SOUND_PARAMS)
             
-            # Apply fade out after halfway
-            if i > n_samples // 2:
-                value *= (n_samples - i) / (n_samples // 2)
-                
-            # Convert to 16-bit signed value for stereo (left and right channel)
-            left_channel = int(value * 32767)
-            right_channel = int(value * 32767)
-            packed_value = struct.pack('hh', left_channel, right_channel)
-            buf.write(packed_value)
+    def _load_variants(self, name, params):
+        # Raw interleaved int16 stereo samples for each variant of one sound.
+        # Every variant is its own cache entry, keyed by its pitch, volume
+        # and pan as well as the sound's parameters, so a warm start only
+        # reads files; the sound is synthesized and resampled on a miss.
+        if self.cache is None:
+            return self._make_variants(self._synthesize(params))
             
-        self.sounds['death'] = pygame.mixer.Sound(buffer=buf.getvalue())
-    
-    def _generate_pickup_sound(self):
-        # Create an ascending pickup sound
-        sample_rate = 44100
-        duration = 0.2
-        n_samples = int(sample_rate * duration)
-        buf = io.BytesIO()
+        audio_format = pygame.mixer.get_init()
+        entries = [f"{name}.{index}" for index in range(len(self.SOUND_VARIANTS))]
+        keys = [self.cache.key(name, dict(params, variant=variant), self.GENERATOR_VERSION, audio_format)
+                for variant in self.SOUND_VARIANTS]
+        variants = [self.cache.load(entry, key) for entry, key in zip(entries, keys)]
+        if None in variants:
+            variants = self._make_variants(self._synthesize(params))
+            for entry, key, pcm in zip(entries, keys, variants):
+                self.cache.store(entry, key, pcm)
+            # Older versions cached only the base sound, under its plain name
+            self.cache.remove(name)
+        return variants
         
-        for i in range(n_samples):
-            t = float(i) / sample_rate
-            progress = float(i) / n_samples
-            
-            # Ascending frequency from 400Hz to 800Hz
-            freq = 400 + 400 * progress
-            value = 0.5 * math.sin(2 * math.pi * freq * t)
-            
-            # Apply fade out near the end
-            if i > int(n_samples * 0.8):
-                value *= (n_samples - i) / (n_samples * 0.2)
-                
-            # Convert to 16-bit signed value for stereo (left and right channel)
-            left_channel = int(value * 32767)
-            right_channel = int(value * 32767)
-            packed_value = struct.pack('hh', left_channel, right_channel)
-            buf.write(packed_value)
-            
-        self.sounds['pickup'] = pygame.mixer.Sound(buffer=buf.getvalue())
-    
-    def _generate_background_music(self):
-        # Create simple background music
-        sample_rate = 44100
-        duration = 5.0  # shorter to save memory
-        n_samples = int(sample_rate * duration)
-        buf = io.BytesIO()
+    def _synthesize(self, params):
+        if params['kind'] == 'tone':
+            wave = self._synthesize_tone(params)
+        elif params['kind'] == 'sweep':
+            wave = self._synthesize_sweep(params)
+        else:
+            raise ValueError(f"Unknown sound kind: {params['kind']}")
+        return synth.to_stereo(wave)
         
-        for i in range(n_samples):
-            t = float(i) / sample_rate
-            
-            # Multiple tones for richer sound
-            value1 = 0.3 * math.sin(2 * math.pi * 180 * t)  # Base tone
-            value2 = 0.15 * math.sin(2 * math.pi * 270 * t)  # Harmony
-            value3 = 0.05 * math.sin(2 * math.pi * 360 * t * (1 + 0.1 * math.sin(2 * math.pi * 0.1 * t)))  # Modulated
-            
-            value = value1 + value2 + value3
-                
-            # Convert to 16-bit signed value for stereo (left and right channel)
-            left_channel = int(value * 32767)
-            right_channel = int(value * 32767)
-            packed_value = struct.pack('hh', left_channel, right_channel)
-            buf.write(packed_value)
-            
-        self.sounds['background'] = pygame.mixer.Sound(buffer=buf.getvalue())
+    def _synthesize_tone(self, params):
+        # Sine wave with an optional fade out
+        wave = synth.oscillator(params['frequency'], params['duration'], params['volume'])
+        if params.get('fade_out_start'):
+            wave *= synth.fade_out(len(wave), params['fade_out_start'])
+        return wave
+    
+    def _synthesize_sweep(self, params):
+        # Sine wave gliding between two frequencies, with a fade out
+        duration = params['duration']
+        frequencies = synth.sweep(params['start_freq'], params['end_freq'], duration)
+        wave = synth.oscillator(frequencies, duration, params['volume'])
+        wave *= synth.fade_out(len(wave), params['fade_out_start'])
+        return wave
+    
+    def update_music(self, level):
+        """Start or continue streaming background music for a level."""
+        if self.music is None:
+            self.music = MusicStream(pygame.mixer.Channel(self.MUSIC_CHANNEL))
+        if self.music.level != level:
+            self.music.set_level(level)
+        if not self.music.playing:
+            self.music.start()
+        self.music.update()
+        
+    def stop_music(self):
+        if self.music is not None and self.music.playing:
+            self.music.stop()
+    
+    def begin_frame(self):
+        """Call once per frame so repeated sounds within a frame are merged."""
+        self.voices.begin_frame()
     
     def play_sound(self, sound_name):
-        if sound_name in self.sounds:
-            self.sounds[sound_name].play()
+        # Sounds still loading in the background are silently skipped
+        variants = self.sounds.get(sound_name)
+        if variants:
+            settings = self.VOICE_SETTINGS.get(sound_name, {})
+            self.voices.play(sound_name, self.variant_rng.choice(variants), **settings)
 
 # Main game function
-def main():
+def main(seed=None, record_path=None, replay_path=None):
+    """Run the game in a window.
+    
+    seed fixes the dungeon and all game randomness. With record_path the
+    first run is saved as a replay when it ends or the game is closed;
+    with replay_path a saved run is played back instead of reading the
+    keyboard, checking its state checksums as it goes.
+    """
     global SCREEN_WIDTH, SCREEN_HEIGHT, screen, clock, TILE_SIZE, BLACK, DARK_GRAY, GRAY, BROWN, GREEN
     
+    init_display()
     game_state = GameState.MAIN_MENU
     
     # Import all the game components here to avoid circular imports
-    from player import Player
-    from level import DungeonGenerator
-    from enemy import Enemy
-    from item import Item
     from ui import UI
+    from particles import ParticleBatch
+    from controls import KeyboardInput
+    from simulation import Simulation
+    from replay import Recording, Recorder, Replayer
+    from perf_overlay import FrameProfiler, PerfOverlay
+    from collision import substep_budget
     
-    # Initialize game components
-    dungeon_generator = DungeonGenerator(100, 100, TILE_SIZE)
-    level_map, start_pos, exit_pos = dungeon_generator.generate_dungeon()
+    # Sound generator
+    sound_gen = SoundGenerator(SoundCache())
+    sound_gen.start_loading()
     
-    player = Player(start_pos[0], start_pos[1], TILE_SIZE)
-    camera = Camera(dungeon_generator.width * TILE_SIZE, dungeon_generator.height * TILE_SIZE)
+    # Initialize game components: the simulation holds the player, the
+    # current level and the level and difficulty counters
+    replayer = recorder = None
+    if replay_path:
+        # Play the recorded run straight away, with its seed
+        replayer = Replayer(Recording.load(replay_path))
+        sim = Simulation(replayer.recording.tile_size, sound_gen, seed=replayer.recording.seed)
+        game_state = GameState.PLAYING
+    else:
+        sim = Simulation(TILE_SIZE, sound_gen, seed=seed)
+        if record_path:
+            recorder = Recorder(sim)
+    camera = Camera(sim.dungeon_generator.width * TILE_SIZE, sim.dungeon_generator.height * TILE_SIZE)
     ui = UI(SCREEN_WIDTH, SCREEN_HEIGHT)
+    keyboard = KeyboardInput()
     
-    # Create enemy list
-    enemies = dungeon_generator.spawn_enemies(10, player)
+    # Shared batch so all entity particles are drawn in one blits call
+    particle_batch = ParticleBatch()
+    particle_count = 0
     
-    # Create item list
-    items = dungeon_generator.spawn_items(5)
+    # Frame timing overlay, toggled with F3; the profiler hooks do nothing while it is hidden
+    profiler = FrameProfiler()
+    perf_overlay = PerfOverlay(profiler)
     
-    # Sound generator
-    sound_gen = SoundGenerator()
-    sound_gen.generate_sounds()
-    
-    # Game level and difficulty variables
-    current_level = 1
-    max_levels = 5
-    difficulty_multiplier = 1.0
+    def overlay_counts():
+        level = sim.level
+        ai = level.ai_scheduler.stats()
+        paths = level.pathfinder.stats()
+        voices = sound_gen.voices.stats()
+        return {
+            'enemies': len(level.enemies),
+            'items': len(level.items),
+            'particles': particle_count,
+            'AI full/reduced/sleeping': "%d/%d/%d" % (ai['full_rate'], ai['reduced'], ai['sleeping']),
+            'path queue': "%d (%d nodes)" % (paths['queue_depth'], paths['nodes_last_update']),
+            'substeps': substep_budget.stats()['substeps_last_frame'],
+            'voices': "%d active, %d dropped" % (voices['active'], voices['dropped']),
+        }
     
     # Store button rects from UI for click detection
     start_button_rect = None
@@ -266,6 +366,8 @@ def main():
     
     while running:
         dt = clock.tick(FPS) / 1000.0  # Delta time in seconds
+        profiler.begin_frame()
+        sound_gen.begin_frame()
         
         # Event handling
         for event in pygame.event.get():
@@ -287,21 +389,18 @@ def main():
                 if event.key == pygame.K_ESCAPE:
                     running = False
                 
+                if event.key == pygame.K_F3:
+                    profiler.toggle()
+                
                 if game_state == GameState.MAIN_MENU and event.key == pygame.K_RETURN:
                     game_state = GameState.PLAYING
                     print("Starting game via keyboard")
                 
                 if game_state == GameState.GAME_OVER and event.key == pygame.K_RETURN:
                     # Reset game
-                    current_level = 1
-                    difficulty_multiplier = 1.0
-                    dungeon_generator = DungeonGenerator(100, 100, TILE_SIZE)
-                    level_map, start_pos, exit_pos = dungeon_generator.generate_dungeon()
-                    player = Player(start_pos[0], start_pos[1], TILE_SIZE)
+                    sim = Simulation(TILE_SIZE, sound_gen)
                     # Initialize camera with current screen dimensions
-                    camera = Camera(dungeon_generator.width * TILE_SIZE, dungeon_generator.height * TILE_SIZE)
-                    enemies = dungeon_generator.spawn_enemies(10 * difficulty_multiplier, player)
-                    items = dungeon_generator.spawn_items(5)
+                    camera = Camera(sim.dungeon_generator.width * TILE_SIZE, sim.dungeon_generator.height * TILE_SIZE)
                     game_state = GameState.PLAYING
                 
                 if game_state == GameState.VICTORY and event.key == pygame.K_RETURN:
@@ -322,13 +421,7 @@ def main():
                 if game_state == GameState.GAME_OVER and retry_button_rect:
                     if retry_button_rect.collidepoint(mouse_pos):
                         # Reset game
-                        current_level = 1
-                        difficulty_multiplier = 1.0
-                        dungeon_generator = DungeonGenerator(100, 100, TILE_SIZE)
-                        level_map, start_pos, exit_pos = dungeon_generator.generate_dungeon()
-                        player = Player(start_pos[0], start_pos[1], TILE_SIZE)
-                        enemies = dungeon_generator.spawn_enemies(10 * difficulty_multiplier, player)
-                        items = dungeon_generator.spawn_items(5)
+                        sim = Simulation(TILE_SIZE, sound_gen)
                         game_state = GameState.PLAYING
                         sound_gen.play_sound('pickup')
                 
@@ -337,101 +430,200 @@ def main():
                         running = False
                         sound_gen.play_sound('pickup')
         
+        profiler.mark('input')
+        
+        # Stream background music only while playing
+        if game_state == GameState.PLAYING:
+            sound_gen.update_music(sim.current_level)
+        else:
+            sound_gen.stop_music()
+        profiler.mark('audio')
+        
         # Game state logic
         if game_state == GameState.MAIN_MENU:
             # Draw main menu
             screen.fill(BLACK)
-            start_button_rect = ui.draw_main_menu(screen)
+            start_button_rect = ui.draw_main_menu(screen, sound_gen.progress())
+            profiler.mark('ui')
             
         elif game_state == GameState.PLAYING:
-            # Update player
-            player.update(dt, level_map, enemies, items, sound_gen)
+            # Advance the game logic by one frame, with the recorded dt and
+            # input when replaying
+            if replayer is not None:
+                dt, inputs = replayer.next_tick()
+            else:
+                inputs = keyboard.poll()
+            sim.step(dt, inputs, profiler)
+            player, level = sim.player, sim.level
             
-            # Check if player reached exit
-            player_center = player.rect.center
-            exit_center = (exit_pos[0] + TILE_SIZE // 2, exit_pos[1] + TILE_SIZE // 2)
-            if math.dist(player_center, exit_center) < TILE_SIZE:
-                current_level += 1
-                difficulty_multiplier += 0.2
-                
-                if current_level > max_levels:
-                    game_state = GameState.VICTORY
-                else:
-                    # Generate new level
-                    dungeon_generator = DungeonGenerator(100, 100, TILE_SIZE)
-                    level_map, start_pos, exit_pos = dungeon_generator.generate_dungeon()
-                    player.rect.x, player.rect.y = start_pos[0], start_pos[1]
-                    enemies = dungeon_generator.spawn_enemies(int(10 * difficulty_multiplier), player)
-                    items = dungeon_generator.spawn_items(5)
-            
-            # Update enemies
-            for enemy in enemies[:]:
-                enemy.update(dt, level_map, player, enemies, sound_gen)
-                if enemy.health <= 0:
-                    enemies.remove(enemy)
-                    player.score += 10
+            if recorder is not None:
+                recorder.record(sim, dt, inputs)
+            if replayer is not None:
+                if not replayer.check(sim) and len(replayer.mismatches) == 1:
+                    print(f"Replay diverged at tick {replayer.tick - 1}")
+                if replayer.finished:
+                    print(f"Replay finished: {replayer.tick} ticks, {len(replayer.mismatches)} checksum mismatches")
+                    running = False
             
             # Update camera
             camera.update(player)
+            profiler.mark('player')
             
-            # Check for game over
-            if player.health <= 0:
+            # Check for victory or game over
+            if sim.victory:
+                game_state = GameState.VICTORY
+            elif sim.game_over:
                 game_state = GameState.GAME_OVER
             
+            # Only the first run is recorded
+            if sim.finished and recorder is not None:
+                recorder.recording.save(record_path)
+                recorder = None
+            
             # Draw everything
             screen.fill(BLACK)
             
-            # Draw map
-            for y in range(dungeon_generator.height):
-                for x in range(dungeon_generator.width):
-                    tile = level_map[y][x]
-                    if tile != 0:  # Skip empty tiles
-                        tile_rect = pygame.Rect(x * TILE_SIZE, y * TILE_SIZE, TILE_SIZE, TILE_SIZE)
-                        tile_rect = camera.apply(pygame.Rect(x * TILE_SIZE, y * TILE_SIZE, TILE_SIZE, TILE_SIZE))
-                        
-                        if tile == 1:  # Wall
-                            pygame.draw.rect(screen, DARK_GRAY, tile_rect)
-                            pygame.draw.rect(screen, GRAY, tile_rect, 1)
-                        elif tile == 2:  # Floor
-                            pygame.draw.rect(screen, BROWN, tile_rect)
-                            pygame.draw.rect(screen, DARK_GRAY, tile_rect, 1)
+            # Draw the merged wall and floor blocks in view
+            draw_level(screen, level.geometry, camera)
+            profiler.mark('map')
             
             # Draw exit
-            exit_rect = pygame.Rect(exit_pos[0], exit_pos[1], TILE_SIZE, TILE_SIZE)
+            exit_rect = pygame.Rect(sim.exit_pos[0], sim.exit_pos[1], TILE_SIZE, TILE_SIZE)
             exit_rect = camera.apply(exit_rect)
             pygame.draw.rect(screen, GREEN, exit_rect)
             
             # Draw items
-            for item in items:
-                if not item.collected:
-                    item_rect = camera.apply(item.rect)
-                    item.draw(screen, item_rect)
+            for item in level.items:
+                item_rect = camera.apply(item.rect)
+                item.draw(screen, item_rect, particle_batch)
             
             # Draw enemies
-            for enemy in enemies:
+            for enemy in level.enemies:
                 enemy_rect = camera.apply(enemy.rect)
-                enemy.draw(screen, enemy_rect)
+                enemy.draw(screen, enemy_rect, particle_batch)
             
             # Draw player
             player_rect = camera.apply(player.rect)
-            player.draw(screen, player_rect)
+            player.draw(screen, player_rect, particle_batch)
+            profiler.mark('entities')
+            
+            # Draw all queued particles on top of the entities
+            particle_count = len(particle_batch)
+            particle_batch.flush(screen)
+            profiler.mark('particles')
             
             # Draw UI
-            ui.draw_game_ui(screen, player, current_level)
+            ui.draw_game_ui(screen, player, sim.current_level)
+            profiler.mark('ui')
             
         elif game_state == GameState.GAME_OVER:
             # Draw game over screen
             screen.fill(BLACK)
-            retry_button_rect = ui.draw_game_over(screen, player.score)
+            retry_button_rect = ui.draw_game_over(screen, sim.player.score)
+            profiler.mark('ui')
             
         elif game_state == GameState.VICTORY:
             # Draw victory screen
             screen.fill(BLACK)
-            exit_button_rect = ui.draw_victory(screen, player.score)
+            exit_button_rect = ui.draw_victory(screen, sim.player.score)
+            profiler.mark('ui')
+        
+        if profiler.enabled:
+            perf_overlay.draw(screen, overlay_counts)
+            profiler.mark('overlay')
         
         pygame.display.flip()
+        profiler.mark('flip')
     
+    if recorder is not None:
+        recorder.recording.save(record_path)
     pygame.quit()
 
+def run_headless(ticks, input_source=None, dt=1.0 / FPS, seed=None, record_path=None):
+    """Run the game logic with no window, audio or frame cap.
+    
+    Steps a fresh Simulation by a fixed dt per tick, as fast as the CPU
+    allows, for the given number of ticks or until the run ends. Input
+    comes from input_source (default: random wandering). With record_path
+    the run is saved as a replay. Returns the simulation and a summary of
+    the run.
+    """
+    from controls import RandomInput
+    from simulation import Simulation
+    from replay import Recorder
+    
+    if input_source is None:
+        input_source = RandomInput()
+    
+    start = time.perf_counter()
+    sim = Simulation(TILE_SIZE, seed=seed)
+    setup_time = time.perf_counter() - start
+    recorder = Recorder(sim) if record_path else None
+    
+    start = time.perf_counter()
+    while sim.ticks < ticks and not sim.finished:
+        inputs = input_source.poll()
+        sim.step(dt, inputs)
+        if recorder is not None:
+            recorder.record(sim, dt, inputs)
+    elapsed = time.perf_counter() - start
+    
+    if recorder is not None:
+        recorder.recording.save(record_path)
+    
+    summary = {
+        'seed': sim.seed,
+        'ticks': sim.ticks,
+        'setup_seconds': setup_time,
+        'seconds': elapsed,
+        'ticks_per_second': sim.ticks / elapsed if elapsed > 0 else 0.0,
+        'level': sim.current_level,
+        'score': sim.player.score,
+        'health': sim.player.health,
+        'enemies': len(sim.level.enemies),
+        'victory': sim.victory,
+        'game_over': sim.game_over,
+    }
+    return sim, summary
+
+def seed_arg(text):
+    # Seeds are stored in 32 bits in replay files
+    seed = int(text)
+    if not 0 <= seed < 2 ** 32:
+        raise argparse.ArgumentTypeError("seed must be between 0 and 4294967295, got %s" % text)
+    return seed
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Dungeon Explorer")
+    parser.add_argument('--headless', action='store_true',
+                        help="run the simulation with no window or audio and print a summary")
+    parser.add_argument('--ticks', type=int, default=3600,
+                        help="ticks to simulate in headless mode (default: 3600)")
+    parser.add_argument('--input-seed', type=int, default=None,
+                        help="seed for the random input used in headless mode")
+    parser.add_argument('--seed', type=seed_arg, default=None,
+                        help="seed for the dungeon and all game randomness")
+    parser.add_argument('--record', metavar='PATH',
+                        help="save the run's seed and input as a replay file")
+    parser.add_argument('--replay', metavar='PATH',
+                        help="play back a replay file, checking its state checksums")
+    return parser.parse_args(argv)
+
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    args = parse_args(sys.argv[1:])
+    if args.headless and args.replay:
+        from replay import Recording, replay_headless
+        sim, replayer = replay_headless(Recording.load(args.replay))
+        print(f"ticks: {replayer.tick}")
+        print(f"checksum mismatches: {len(replayer.mismatches)}")
+        if replayer.mismatches:
+            print(f"first mismatch at tick: {replayer.mismatches[0]}")
+            sys.exit(1)
+    elif args.headless:
+        from controls import RandomInput
+        sim, summary = run_headless(args.ticks, RandomInput(args.input_seed), seed=args.seed,
+                                    record_path=args.record)
+        for name, value in summary.items():
+            print(f"{name}: {value}")
+    else:
+        main(args.seed, args.record, args.replay)
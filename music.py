@@ -0,0 +1,102 @@
+import random
+import numpy as np
+import pygame
+import synth
+
+# Minor pentatonic scale in semitones above the root
+SCALE = [0, 3, 5, 7, 10, 12]
+
+class MusicStream:
+    """Procedural background music synthesized in small chunks.
+
+    Only the chunk that is playing and the one queued behind it exist at
+    any time, so memory stays constant however long the music runs. Each
+    voice keeps its phase across chunks, so chunk boundaries are seamless,
+    and a new note is picked from the scale every few chunks so the music
+    never loops.
+    """
+
+    CHUNK_DURATION = 0.5  # seconds of audio synthesized per chunk
+    GLIDE_DURATION = 0.15  # seconds spent sliding into a new note
+
+    def __init__(self, channel, seed=None):
+        self.channel = channel
+        self.rng = random.Random(seed)
+        self.playing = False
+        self.level = None
+
+        # Musical parameters, adjusted per level by set_level()
+        self.root_freq = 180
+        self.chunks_per_note = 4
+        self.volume = 1.0
+
+        # Synthesis state carried from chunk to chunk
+        self.base_phase = 0.0
+        self.harmony_phase = 0.0
+        self.modulated_phase = 0.0
+        self.lfo_phase = 0.0
+        self.current_freq = self.root_freq
+        self.target_freq = self.root_freq
+        self.chunks_until_note = 0
+
+    def set_level(self, level):
+        """Vary root pitch and tempo with the dungeon level."""
+        self.level = level
+        # Each level sits two semitones lower and changes notes faster
+        self.root_freq = 180 * 2 ** (-2 * (level - 1) / 12)
+        self.chunks_per_note = max(1, 5 - level)
+        self.chunks_until_note = 0
+
+    def start(self):
+        self.playing = True
+        self.update()
+
+    def stop(self):
+        self.playing = False
+        self.channel.stop()
+
+    def update(self):
+        """Keep one chunk playing and one queued; call once per frame."""
+        if not self.playing:
+            return
+        if not self.channel.get_busy():
+            self.channel.play(self._next_chunk())
+        if self.channel.get_queue() is None:
+            self.channel.queue(self._next_chunk())
+
+    def _pick_note(self):
+        semitones = self.rng.choice(SCALE)
+        return self.root_freq * 2 ** (semitones / 12)
+
+    def _next_chunk(self):
+        n_samples = synth.sample_count(self.CHUNK_DURATION)
+
+        # Move to a new note every few chunks, gliding from the old one
+        start_freq = self.current_freq
+        if self.chunks_until_note <= 0:
+            self.target_freq = self._pick_note()
+            self.chunks_until_note = self.chunks_per_note
+        self.chunks_until_note -= 1
+
+        glide = np.full(n_samples, self.target_freq)
+        if start_freq != self.target_freq:
+            glide_samples = min(n_samples, synth.sample_count(self.GLIDE_DURATION))
+            glide[:glide_samples] = np.linspace(start_freq, self.target_freq, glide_samples)
+        self.current_freq = self.target_freq
+
+        # Slow vibrato on the top voice, as in the original drone
+        lfo = synth.phase_ramp(0.1, n_samples, self.lfo_phase)
+        self.lfo_phase = lfo[-1] % (2 * np.pi)
+        vibrato = glide * 2 * (1 + 0.1 * np.sin(lfo[:-1]))
+
+        base = synth.phase_ramp(glide, n_samples, self.base_phase)
+        harmony = synth.phase_ramp(glide * 1.5, n_samples, self.harmony_phase)
+        modulated = synth.phase_ramp(vibrato, n_samples, self.modulated_phase)
+        self.base_phase = base[-1] % (2 * np.pi)
+        self.harmony_phase = harmony[-1] % (2 * np.pi)
+        self.modulated_phase = modulated[-1] % (2 * np.pi)
+
+        wave = (0.3 * np.sin(base[:-1])
+                + 0.15 * np.sin(harmony[:-1])
+                + 0.05 * np.sin(modulated[:-1]))
+        return pygame.mixer.Sound(buffer=synth.to_stereo(wave * self.volume).tobytes())
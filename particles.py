@@ -0,0 +1,55 @@
+import pygame
+from collections import OrderedDict
+
+class ParticleBatch:
+    """Collects particle splats for a frame and draws them with one blits call.
+
+    Every particle is drawn as a pre-rendered circle sprite, cached by color
+    and radius, so a frame full of particles costs a single Surface.blits
+    instead of one pygame.draw.circle call per particle. The cache keeps
+    the max_sprites most recently used sprites, so effects that keep
+    picking new colors cannot grow it without bound.
+    """
+
+    def __init__(self, max_sprites=256):
+        self.sprite_cache = OrderedDict()
+        self.max_sprites = max_sprites
+        self.blit_sequence = []
+
+    def _create_sprite(self, color, radius):
+        """Render and cache the circle sprite for a color and radius."""
+        # Particles are opaque, so any alpha component is dropped
+        rgb = tuple(color[:3])
+        # Colorkeyed sprites blit much faster than per-pixel alpha ones
+        colorkey = (0, 0, 0) if rgb != (0, 0, 0) else (255, 255, 255)
+        sprite = pygame.Surface((radius * 2, radius * 2))
+        sprite.fill(colorkey)
+        pygame.draw.circle(sprite, rgb, (radius, radius), radius)
+        sprite.set_colorkey(colorkey, pygame.RLEACCEL)
+        self.sprite_cache[(color, radius)] = sprite
+        if len(self.sprite_cache) > self.max_sprites:
+            # Drop the least recently used sprite
+            self.sprite_cache.popitem(last=False)
+        return sprite
+
+    def add(self, color, pos, radius):
+        """Queue a filled circle at a screen position."""
+        # pygame.draw.circle draws nothing below a radius of 1
+        if radius < 1:
+            return
+        key = (color, radius)
+        sprite = self.sprite_cache.get(key)
+        if sprite is None:
+            sprite = self._create_sprite(color, radius)
+        else:
+            self.sprite_cache.move_to_end(key)
+        self.blit_sequence.append((sprite, (pos[0] - radius, pos[1] - radius)))
+
+    def flush(self, surface):
+        """Draw every queued particle onto the surface and clear the batch."""
+        if self.blit_sequence:
+            surface.blits(self.blit_sequence, doreturn=False)
+            self.blit_sequence = []
+
+    def __len__(self):
+        return len(self.blit_sequence)
@@ -0,0 +1,298 @@
+import heapq
+from array import array
+from collections import OrderedDict, deque
+from tiles import WALL
+
+class FlowField:
+    """Shared BFS distance map leading every walker towards one target tile.
+
+    The field is stored as flat arrays over the level grid: the step
+    distance to the target and, for every reached tile, the index of the
+    neighbouring tile one step closer. It is rebuilt only when the target
+    moves to a different tile, after which any number of enemies can read
+    their next step in O(1).
+
+    The search stops at max_distance steps, since enemies only chase
+    from a few tiles away; only tiles touched by the previous search are
+    reset before a rebuild.
+    """
+
+    UNREACHED = -1
+
+    def __init__(self, level_map, max_distance=32):
+        self.height = len(level_map)
+        self.width = len(level_map[0])
+        self.max_distance = max_distance
+        self.walkable = bytearray(
+            1 if tile != WALL else 0
+            for row in level_map
+            for tile in row
+        )
+        size = self.width * self.height
+        self.distance = array('i', [self.UNREACHED]) * size
+        self.next_index = array('i', [self.UNREACHED]) * size
+        self.reached = []
+        self.target_tile = None
+        self.rebuilds = 0
+
+    def update(self, tile_x, tile_y):
+        """Point the field at a target tile; returns True if it was rebuilt."""
+        if (tile_x, tile_y) == self.target_tile:
+            return False
+        self.target_tile = (tile_x, tile_y)
+        self._rebuild(tile_x, tile_y)
+        return True
+
+    def update_from_position(self, x, y, tile_size):
+        return self.update(int(x // tile_size), int(y // tile_size))
+
+    def _rebuild(self, tile_x, tile_y):
+        distance = self.distance
+        next_index = self.next_index
+        walkable = self.walkable
+        width = self.width
+        max_distance = self.max_distance
+
+        # Clear only what the previous search touched
+        for index in self.reached:
+            distance[index] = self.UNREACHED
+            next_index[index] = self.UNREACHED
+        self.reached = reached = []
+        self.rebuilds += 1
+
+        if not (0 <= tile_x < width and 0 <= tile_y < self.height):
+            return
+        start = tile_y * width + tile_x
+        if not walkable[start]:
+            return
+
+        distance[start] = 0
+        next_index[start] = start
+        reached.append(start)
+        queue = deque([start])
+        while queue:
+            index = queue.popleft()
+            step = distance[index] + 1
+            if step > max_distance:
+                continue
+            x = index % width
+            # Level borders are always walls, but guard the edges anyway
+            for neighbour, in_bounds in (
+                (index + 1, x + 1 < width),
+                (index - 1, x > 0),
+                (index + width, index + width < len(walkable)),
+                (index - width, index >= width)
+            ):
+                if in_bounds and walkable[neighbour] and distance[neighbour] == self.UNREACHED:
+                    distance[neighbour] = step
+                    next_index[neighbour] = index
+                    reached.append(neighbour)
+                    queue.append(neighbour)
+
+    def distance_at(self, tile_x, tile_y):
+        """Steps from a tile to the target, or -1 when unreachable."""
+        if not (0 <= tile_x < self.width and 0 <= tile_y < self.height):
+            return self.UNREACHED
+        return self.distance[tile_y * self.width + tile_x]
+
+    def next_step(self, tile_x, tile_y):
+        """Tile one step closer to the target, or None if unreachable."""
+        if not (0 <= tile_x < self.width and 0 <= tile_y < self.height):
+            return None
+        index = self.next_index[tile_y * self.width + tile_x]
+        if index == self.UNREACHED:
+            return None
+        return index % self.width, index // self.width
+
+class PathRequest:
+    """Handle for a path search; done becomes True once path is filled in.
+
+    path is the list of tiles from the first step to the goal, or None if
+    the goal cannot be reached.
+    """
+
+    def __init__(self, start, goal):
+        self.start = start
+        self.goal = goal
+        self.path = None
+        self.done = False
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+class _Search:
+    # In-progress A* state for one request, kept between frames
+    def __init__(self, request, start_index, goal_index):
+        self.request = request
+        self.goal_index = goal_index
+        self.open = [(0, 0, start_index)]
+        self.g_cost = {start_index: 0}
+        self.came_from = {start_index: start_index}
+        self.counter = 0
+        self.expanded = 0
+
+class PathfindingService:
+    """Time-sliced A* over the level grid for enemies that need their own routes.
+
+    Requests are queued and searched a little every frame: update()
+    expands at most node_budget tiles in total, so a long search is spread
+    over several frames instead of causing a spike. Finished paths are
+    cached by (start tile, goal tile, map version), and repeated requests
+    are answered immediately.
+    """
+
+    def __init__(self, level_map, node_budget=400, max_nodes_per_search=4000, cache_size=256):
+        self.width = len(level_map[0])
+        self.height = len(level_map)
+        self.walkable = bytearray(
+            1 if tile != WALL else 0
+            for row in level_map
+            for tile in row
+        )
+        self.node_budget = node_budget
+        self.max_nodes_per_search = max_nodes_per_search
+        self.cache_size = cache_size
+        self.map_version = 0
+        self.cache = OrderedDict()
+        self.queue = deque()
+        self.active = None
+
+        # Statistics for profiling
+        self.nodes_last_update = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.completed = 0
+
+    def set_map(self, level_map):
+        """Replace the walkable grid; cached paths from older maps are discarded."""
+        self.walkable = bytearray(
+            1 if tile != WALL else 0
+            for row in level_map
+            for tile in row
+        )
+        self.map_version += 1
+        self.cache.clear()
+        for search in ([self.active] if self.active else []) + list(self.queue):
+            search.request.cancel()
+        self.queue.clear()
+        self.active = None
+
+    def is_walkable(self, tile_x, tile_y):
+        return (0 <= tile_x < self.width and 0 <= tile_y < self.height
+                and self.walkable[tile_y * self.width + tile_x] == 1)
+
+    def request(self, start, goal):
+        """Queue a search from start to goal tile and return its PathRequest."""
+        request = PathRequest(start, goal)
+        key = (start, goal, self.map_version)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            self.cache_hits += 1
+            self._finish(request, self.cache[key])
+            return request
+
+        self.cache_misses += 1
+        if not (self.is_walkable(*start) and self.is_walkable(*goal)):
+            self._finish(request, None)
+            return request
+
+        start_index = start[1] * self.width + start[0]
+        goal_index = goal[1] * self.width + goal[0]
+        self.queue.append(_Search(request, start_index, goal_index))
+        return request
+
+    def update(self):
+        """Advance queued searches by at most node_budget expansions."""
+        budget = self.node_budget
+        while budget > 0:
+            if self.active is None or self.active.request.cancelled:
+                if not self.queue:
+                    self.active = None
+                    break
+                self.active = self.queue.popleft()
+                continue
+            budget -= self._expand(self.active, budget)
+        self.nodes_last_update = self.node_budget - budget
+
+    def _expand(self, search, budget):
+        # Run A* on one search until it finishes or the budget runs out
+        width = self.width
+        walkable = self.walkable
+        goal_x = search.goal_index % width
+        goal_y = search.goal_index // width
+        open_heap = search.open
+        g_cost = search.g_cost
+        came_from = search.came_from
+        used = 0
+
+        while open_heap and used < budget:
+            _, _, index = heapq.heappop(open_heap)
+            used += 1
+            search.expanded += 1
+            if index == search.goal_index:
+                self._complete(search, self._reconstruct(came_from, index))
+                return used
+            if search.expanded >= self.max_nodes_per_search:
+                break
+
+            x = index % width
+            next_cost = g_cost[index] + 1
+            for neighbour, in_bounds in (
+                (index + 1, x + 1 < width),
+                (index - 1, x > 0),
+                (index + width, index + width < len(walkable)),
+                (index - width, index >= width)
+            ):
+                if in_bounds and walkable[neighbour] and next_cost < g_cost.get(neighbour, next_cost + 1):
+                    g_cost[neighbour] = next_cost
+                    came_from[neighbour] = index
+                    # Manhattan distance heuristic
+                    heuristic = abs(neighbour % width - goal_x) + abs(neighbour // width - goal_y)
+                    search.counter += 1
+                    heapq.heappush(open_heap, (next_cost + heuristic, search.counter, neighbour))
+        else:
+            if not open_heap:
+                # Goal unreachable
+                self._complete(search, None)
+            return used
+
+        # Search exceeded its node limit
+        self._complete(search, None)
+        return used
+
+    def _reconstruct(self, came_from, index):
+        path = []
+        while came_from[index] != index:
+            path.append((index % self.width, index // self.width))
+            index = came_from[index]
+        path.reverse()
+        return path
+
+    def _complete(self, search, path):
+        request = search.request
+        key = (request.start, request.goal, self.map_version)
+        self.cache[key] = path
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        self._finish(request, path)
+        self.active = None
+        self.completed += 1
+
+    def _finish(self, request, path):
+        request.path = list(path) if path is not None else None
+        request.done = True
+
+    def queue_depth(self):
+        return len(self.queue) + (1 if self.active is not None else 0)
+
+    def stats(self):
+        """Queue and budget figures for profiling."""
+        return {
+            'queue_depth': self.queue_depth(),
+            'nodes_last_update': self.nodes_last_update,
+            'budget_used': self.nodes_last_update / self.node_budget,
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'completed': self.completed,
+        }
@@ -0,0 +1,190 @@
+import time
+import numpy as np
+import pygame
+
+# Frame sections, in the order the main loop runs them, with their graph colors
+SECTIONS = ('input', 'audio', 'player', 'enemy_ai', 'map', 'entities', 'particles', 'ui', 'overlay', 'flip')
+SECTION_COLORS = {
+    'input': (200, 200, 200),
+    'audio': (255, 140, 200),
+    'player': (0, 191, 255),
+    'enemy_ai': (255, 80, 80),
+    'particles': (255, 200, 0),
+    'map': (205, 133, 63),
+    'entities': (160, 90, 220),
+    'ui': (80, 220, 120),
+    'flip': (170, 170, 170),
+    'overlay': (140, 140, 180),
+}
+SECTION_INDEX = {name: index for index, name in enumerate(SECTIONS)}
+
+class NullProfiler:
+    """Profiler that records nothing, for callers given no profiler."""
+
+    enabled = False
+
+    def mark(self, section):
+        pass
+
+NULL_PROFILER = NullProfiler()
+
+class FrameProfiler:
+    """Times each section of the frame over a rolling window of frames.
+
+    The main loop calls begin_frame() once per frame and mark(section)
+    after each section, which charges the time since the previous mark to
+    that section. While disabled both return straight away, so leaving
+    the hooks in costs next to nothing.
+    """
+
+    def __init__(self, history=300):
+        self.history = history
+        self.enabled = False
+        self.reset()
+
+    def reset(self):
+        self.section_times = np.zeros((self.history, len(SECTIONS)))
+        self.frame_times = np.zeros(self.history)
+        self.frames = 0  # completed frames in the window
+        self.index = -1  # row of the current frame
+        self.frame_start = None
+        self.lap_start = None
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        self.reset()
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self.frame_start is not None:
+            # Frame time covers the whole loop, including the wait for the frame cap
+            self.frame_times[self.index] = (now - self.frame_start) * 1000.0
+            # The row being filled is never counted, so at most history - 1
+            self.frames = min(self.frames + 1, self.history - 1)
+        self.index = (self.index + 1) % self.history
+        self.section_times[self.index] = 0
+        self.frame_start = self.lap_start = now
+
+    def mark(self, section):
+        if not self.enabled or self.lap_start is None:
+            return
+        now = time.perf_counter()
+        self.section_times[self.index, SECTION_INDEX[section]] += (now - self.lap_start) * 1000.0
+        self.lap_start = now
+
+    def _completed_rows(self):
+        # Rows of the completed frames, oldest first
+        return (np.arange(self.frames) + self.index - self.frames) % self.history
+
+    def recent_frame_times(self):
+        """Completed frame times in ms, oldest first."""
+        return self.frame_times[self._completed_rows()]
+
+    def summary(self):
+        """Rolling averages over the recorded frames; None before the first frame."""
+        if not self.frames:
+            return None
+        rows = self._completed_rows()
+        frame_times = self.frame_times[rows]
+        sections = self.section_times[rows].mean(axis=0)
+        mean = frame_times.mean()
+        # 1% low: the frame rate of the slowest 1% of frames
+        slowest = np.sort(frame_times)[-max(1, len(frame_times) // 100):]
+        return {
+            'frame_ms': mean,
+            'fps': 1000.0 / mean if mean > 0 else 0.0,
+            'low_1_percent_fps': 1000.0 / slowest.mean() if slowest.mean() > 0 else 0.0,
+            'sections': dict(zip(SECTIONS, sections)),
+        }
+
+class PerfOverlay:
+    """Panel with frame timing, a section breakdown, counts and a frame-time graph.
+
+    The text is re-rendered a few times a second rather than every frame,
+    so the overlay itself stays cheap while it is shown.
+    """
+
+    WIDTH = 280
+    GRAPH_HEIGHT = 50
+    REFRESH_INTERVAL = 0.25  # seconds between text updates
+    # Frame time at the top of the graph, and reference lines for 60 and 30 FPS
+    GRAPH_MAX_MS = 50.0
+    TARGET_LINES_MS = (1000.0 / 60, 1000.0 / 30)
+
+    def __init__(self, profiler):
+        self.profiler = profiler
+        self.font = pygame.font.Font(None, 18)
+        self.lines = []
+        self.summary = None
+        self.last_refresh = 0.0
+
+    def refresh(self, counts):
+        self.summary = self.profiler.summary()
+        counts = counts() if counts is not None else {}
+        if self.summary is None:
+            self.lines = []
+            return
+        white = (255, 255, 255)
+        text = [
+            ("%.1f FPS   %.2f ms   1%% low %.1f FPS" % (
+                self.summary['fps'], self.summary['frame_ms'], self.summary['low_1_percent_fps']), white),
+        ]
+        for name in SECTIONS:
+            text.append(("%s  %.2f ms" % (name, self.summary['sections'][name]), SECTION_COLORS[name]))
+        for name, value in counts.items():
+            text.append(("%s: %s" % (name, value), white))
+        self.lines = [self.font.render(line, True, color) for line, color in text]
+
+    def draw(self, surface, counts=None):
+        """Draw the panel in the bottom-right corner.
+
+        counts is a function returning a dict of labels to values; it is
+        only called when the text is refreshed.
+        """
+        now = time.perf_counter()
+        if now - self.last_refresh >= self.REFRESH_INTERVAL:
+            self.refresh(counts)
+            self.last_refresh = now
+        if self.summary is None:
+            return
+
+        line_height = self.font.get_linesize()
+        bar_height = 8
+        height = 10 + len(self.lines) * line_height + bar_height + 6 + self.GRAPH_HEIGHT + 10
+        panel = pygame.Rect(surface.get_width() - self.WIDTH - 10, surface.get_height() - height - 10,
+                            self.WIDTH, height)
+        background = pygame.Surface(panel.size, pygame.SRCALPHA)
+        background.fill((0, 0, 0, 180))
+        surface.blit(background, panel.topleft)
+
+        x = panel.x + 8
+        y = panel.y + 5
+        surface.blits([(line, (x, y + i * line_height)) for i, line in enumerate(self.lines)], False)
+        y += len(self.lines) * line_height + 5
+
+        # Stacked bar: each section's share of the average frame
+        width = self.WIDTH - 16
+        frame_ms = max(self.summary['frame_ms'], 1e-6)
+        left = x
+        for name in SECTIONS:
+            span = int(width * self.summary['sections'][name] / frame_ms)
+            if span > 0:
+                pygame.draw.rect(surface, SECTION_COLORS[name], (left, y, span, bar_height))
+                left += span
+        pygame.draw.rect(surface, (90, 90, 90), (x, y, width, bar_height), 1)
+        y += bar_height + 6
+
+        # Frame-time graph, newest frame on the right
+        graph = pygame.Rect(x, y, width, self.GRAPH_HEIGHT)
+        pygame.draw.rect(surface, (30, 30, 30), graph)
+        for target in self.TARGET_LINES_MS:
+            line_y = graph.bottom - int(graph.height * target / self.GRAPH_MAX_MS)
+            pygame.draw.line(surface, (70, 70, 70), (graph.left, line_y), (graph.right - 1, line_y))
+        frame_times = self.profiler.recent_frame_times()[-graph.width:]
+        if len(frame_times) > 1:
+            heights = np.minimum(frame_times / self.GRAPH_MAX_MS, 1.0) * (graph.height - 1)
+            xs = graph.right - len(frame_times) + np.arange(len(frame_times))
+            points = list(zip(xs.tolist(), (graph.bottom - 1 - heights).astype(int).tolist()))
+            pygame.draw.lines(surface, (0, 255, 0), False, points)
@@ -1,56 +1,105 @@
 import pygame
 import math
 import random
+import numpy as np
+from itertools import compress
+from particles import ParticleBatch
+from collision import move_and_collide
+from spatial import cone_hit_mask
+from controls import LEFT, RIGHT, UP, DOWN, ATTACK
+from ecs import component_property, RectView, damage_system
+
+# Attack angle for each direction (right, down, left, up)
+DIRECTION_ANGLES = (0, math.pi / 2, math.pi, -math.pi / 2)
+
+# Enemies within this angle either side of the facing direction are hit
+ATTACK_HALF_ANGLE = math.pi / 3
 
 class Player:
-    def __init__(self, x, y, size):
-        self.rect = pygame.Rect(x, y, size, size)
+    """The player character.
+
+    Position, stats, timers and animation live in a row of an ecs.World,
+    like the enemies'; this object is a view over that row plus the
+    score, inventory and attack particles.
+    """
+
+    def __init__(self, x, y, size, world):
+        self.world = world
+        self.eid = world.spawn(
+            x=x,
+            y=y,
+            size=size,
+            speed=200,  # pixels per second
+            health=100,
+            max_health=100,
+            attack_power=20,
+            attack_range=size * 1.5,
+            anim_speed=0.1,  # seconds per frame
+            direction=0  # 0: right, 1: down, 2: left, 3: up
+        )
+        self.rect = RectView(world, self.eid)  # read-only; the player moves with move_to()
         self.size = size
         self.color = (0, 191, 255)  # Deep Sky Blue
-        self.speed = 200  # pixels per second
-        self.health = 100
-        self.max_health = 100
-        self.attack_power = 20
         self.attack_cooldown = 0.3  # seconds
-        self.attack_timer = 0
         self.is_attacking = False
-        self.attack_range = size * 1.5
         self.attack_angle = 0  # direction of attack in radians
-        self.invulnerable_timer = 0
         self.invulnerable_duration = 1.0  # seconds
         self.score = 0
         self.items = []
-        
-        # Animation parameters
-        self.anim_frame = 0
-        self.anim_timer = 0
-        self.anim_speed = 0.1  # seconds per frame
-        self.direction = 0  # 0: right, 1: down, 2: left, 3: up
         self.moving = False
         
         # Particle system for attacks
         self.particles = []
+    
+    # Components stored in the world
+    speed = component_property('speed')
+    health = component_property('health')
+    max_health = component_property('max_health')
+    attack_power = component_property('attack_power')
+    attack_timer = component_property('attack_timer')
+    attack_range = component_property('attack_range')
+    invulnerable_timer = component_property('invulnerable_timer')
+    anim_frame = component_property('anim_frame')
+    anim_timer = component_property('anim_timer')
+    anim_speed = component_property('anim_speed')
+    direction = component_property('direction')
+        
+    def move_to(self, x, y):
+        """Place the player's top-left corner at (x, y)."""
+        arrays = self.world.arrays
+        arrays['x'][self.eid] = x
+        arrays['y'][self.eid] = y
+        
+    def update(self, dt, inputs, level_map, enemies, items, sound_gen, enemy_grid=None, item_grid=None, geometry=None):
+        """Update the player for one frame.
+        
+        inputs is the InputState of the buttons held this frame, from the
+        keyboard or any other input source.
         
-    def update(self, dt, level_map, enemies, items, sound_gen):
-        old_x, old_y = self.rect.x, self.rect.y
+        enemies and items are EntityRegistry objects; killed enemies and
+        collected items are destroyed in them for removal at the end of the
+        frame.
         
+        When spatial hashes are given, attacks and item pickups only look at
+        nearby entities instead of scanning the full enemy and item lists,
+        and a LevelGeometry speeds up collision for long moves.
+        """
         # Process movement
-        keys = pygame.key.get_pressed()
         dx, dy = 0, 0
         
-        if keys[pygame.K_LEFT] or keys[pygame.K_a]:
+        if inputs.pressed(LEFT):
             dx -= self.speed * dt
             self.direction = 2
             self.moving = True
-        if keys[pygame.K_RIGHT] or keys[pygame.K_d]:
+        if inputs.pressed(RIGHT):
             dx += self.speed * dt
             self.direction = 0
             self.moving = True
-        if keys[pygame.K_UP] or keys[pygame.K_w]:
+        if inputs.pressed(UP):
             dy -= self.speed * dt
             self.direction = 3
             self.moving = True
-        if keys[pygame.K_DOWN] or keys[pygame.K_s]:
+        if inputs.pressed(DOWN):
             dy += self.speed * dt
             self.direction = 1
             self.moving = True
@@ -58,40 +107,16 @@ class Player:
         if dx == 0 and dy == 0:
             self.moving = False
         
-        # Update position
-        self.rect.x += dx
-        self.rect.y += dy
-        
-        # Check for collisions with walls
-        tile_size = self.size
-        
-        # Calculate grid position
-        grid_x1 = max(0, int(self.rect.left // tile_size))
-        grid_y1 = max(0, int(self.rect.top // tile_size))
-        grid_x2 = min(len(level_map[0]) - 1, int(self.rect.right // tile_size))
-        grid_y2 = min(len(level_map) - 1, int(self.rect.bottom // tile_size))
-        
-        # Check collision with walls
-        collision = False
-        for y in range(grid_y1, grid_y2 + 1):
-            for x in range(grid_x1, grid_x2 + 1):
-                if y < len(level_map) and x < len(level_map[0]):
-                    if level_map[y][x] == 1:  # Wall
-                        wall_rect = pygame.Rect(x * tile_size, y * tile_size, tile_size, tile_size)
-                        if self.rect.colliderect(wall_rect):
-                            collision = True
-                            break
-            if collision:
-                break
-                
-        if collision:
-            self.rect.x, self.rect.y = old_x, old_y
+        # Move, sliding along any walls in the way
+        rect = self.rect.copy()
+        move_and_collide(rect, dx, dy, level_map, self.size, geometry=geometry)
+        self.move_to(rect.x, rect.y)
             
         # Process attack
         self.attack_timer -= dt
         if self.attack_timer <= 0:
-            if keys[pygame.K_SPACE]:
-                self.attack(enemies, sound_gen)
+            if inputs.pressed(ATTACK):
+                self.attack(enemies, sound_gen, enemy_grid)
                 self.attack_timer = self.attack_cooldown
                 
         # Update invulnerability timer
@@ -99,10 +124,17 @@ class Player:
             self.invulnerable_timer -= dt
             
         # Collect items
-        for item in items:
-            if not item.collected and self.rect.colliderect(item.rect):
+        if item_grid is not None:
+            nearby_items = item_grid.query_rect(rect)
+        else:
+            nearby_items = items
+        for item in nearby_items:
+            if not item.collected and rect.colliderect(item.rect):
                 item.collect(self)
                 sound_gen.play_sound('pickup')
+                items.destroy(item)
+                if item_grid is not None:
+                    item_grid.remove(item)
                 
         # Update attack particles
         for particle in self.particles[:]:
@@ -117,39 +149,33 @@ class Player:
                 self.anim_timer = 0
                 self.anim_frame = (self.anim_frame + 1) % 4
                 
-    def attack(self, enemies, sound_gen):
+    def attack(self, enemies, sound_gen, enemy_grid=None):
         self.is_attacking = True
         sound_gen.play_sound('attack')
         
-        # Calculate attack direction based on player direction
-        angle_offset = 0
-        if self.direction == 0:  # right
-            angle_offset = 0
-        elif self.direction == 1:  # down
-            angle_offset = math.pi / 2
-        elif self.direction == 2:  # left
-            angle_offset = math.pi
-        elif self.direction == 3:  # up
-            angle_offset = -math.pi / 2
+        # Attack direction for the facing direction
+        angle_offset = DIRECTION_ANGLES[self.direction]
             
-        # Check for enemies in range
+        # Hit every enemy in the attack cone (60 degrees either side): one
+        # vectorized test over the nearby candidates' positions, then the
+        # damage is applied to all the hit rows of the world at once
         player_center = self.rect.center
-        for enemy in enemies:
-            enemy_center = enemy.rect.center
-            dx = enemy_center[0] - player_center[0]
-            dy = enemy_center[1] - player_center[1]
-            distance = math.sqrt(dx*dx + dy*dy)
-            
-            if distance <= self.attack_range:
-                # Calculate angle to enemy
-                angle_to_enemy = math.atan2(dy, dx)
-                angle_diff = abs(angle_to_enemy - angle_offset)
-                # Normalize angle difference to [0, pi]
-                angle_diff = min(angle_diff, 2 * math.pi - angle_diff)
-                
-                # Check if enemy is in attack cone (60 degrees)
-                if angle_diff <= math.pi / 3:
-                    enemy.take_damage(self.attack_power)
+        if enemy_grid is not None:
+            candidates = enemy_grid.query_square(player_center[0], player_center[1], self.attack_range)
+        else:
+            candidates = list(enemies)
+        
+        if candidates:
+            world = candidates[0].world
+            ids = np.fromiter((enemy.eid for enemy in candidates), dtype=np.int64, count=len(candidates))
+            half_size = world.size[ids] // 2
+            hit = cone_hit_mask(world.x[ids] + half_size, world.y[ids] + half_size,
+                                player_center[0], player_center[1], self.attack_range, angle_offset, ATTACK_HALF_ANGLE)
+            health = damage_system(world, ids[hit], self.attack_power)
+            for enemy, remaining in zip(compress(candidates, hit.tolist()), health.tolist()):
+                enemy._hit_effects()
+                if remaining <= 0:
+                    enemies.destroy(enemy)
                     
         # Create attack particles
         for _ in range(10):
@@ -176,7 +202,7 @@ class Player:
             if sound_gen:
                 sound_gen.play_sound('hit')
                 
-    def draw(self, surface, rect):
+    def draw(self, surface, rect, particle_batch=None):
         # Draw player character
         player_color = self.color
         if self.invulnerable_timer > 0 and int(pygame.time.get_ticks() / 100) % 2 == 0:
@@ -245,17 +271,21 @@ class Player:
             
         pygame.draw.rect(surface, (0, 0, 0), mouth_rect)
         
-        # Draw attack particles
+        # Draw attack particles (queued on particle_batch when one is given)
+        batch = particle_batch if particle_batch is not None else ParticleBatch()
+        offset_x = rect.x - self.rect.x
+        offset_y = rect.y - self.rect.y
         for particle in self.particles:
-            alpha = int(255 * (particle['timer'] / particle['max_timer']))
-            color = particle['color'] + (alpha,)
             pos = (
-                int(particle['x'] - self.rect.x + rect.x),
-                int(particle['y'] - self.rect.y + rect.y)
+                int(particle['x'] + offset_x),
+                int(particle['y'] + offset_y)
             )
             
             size = int(5 * (particle['timer'] / particle['max_timer']))
-            pygame.draw.circle(surface, color[:3], pos, size)
+            batch.add(particle['color'], pos, size)
+            
+        if particle_batch is None:
+            batch.flush(surface)
             
         # Draw attack indicator when attacking
         if self.is_attacking:
@@ -0,0 +1,145 @@
+import struct
+import zlib
+import numpy as np
+from controls import InputState
+from simulation import Simulation
+
+# Replay file layout (little-endian):
+#   header: magic, format version, flags, simulation seed, tile size
+#   then one record per tick: the input mask byte, the tick's dt as a
+#   double only when it differs from the previous tick's, and a CRC32 of
+#   the game state after the tick when the file has checksums.
+MAGIC = b'DXRP'
+VERSION = 1
+HEADER = struct.Struct('<4sBBIH')
+DT = struct.Struct('<d')
+CHECKSUM = struct.Struct('<I')
+PLAYER_STATE = struct.Struct('<iidddii')
+
+# Header flags
+HAS_CHECKSUMS = 1
+
+# Set in an input byte when a new dt follows; buttons use the low bits
+NEW_DT = 0x80
+
+def state_checksum(sim):
+    """CRC32 of the player, the level counter and every live enemy."""
+    player = sim.player
+    crc = zlib.crc32(PLAYER_STATE.pack(player.rect.x, player.rect.y, player.health, player.speed,
+                                       player.attack_power, player.score, sim.current_level))
+    world = sim.world
+    ids = np.fromiter((enemy.eid for enemy in sim.level.enemies), dtype=np.int64, count=len(sim.level.enemies))
+    for array in (world.x, world.y, world.health, world.state):
+        crc = zlib.crc32(array[ids].tobytes(), crc)
+    return crc
+
+class Recording:
+    """The seed and per-tick input of one run, with optional state checksums."""
+
+    def __init__(self, seed, tile_size, checksums=True):
+        self.seed = seed
+        self.tile_size = tile_size
+        self.buttons = bytearray()
+        self.dts = []
+        self.checksums = [] if checksums else None
+
+    def __len__(self):
+        return len(self.buttons)
+
+    def save(self, path):
+        flags = HAS_CHECKSUMS if self.checksums is not None else 0
+        parts = [HEADER.pack(MAGIC, VERSION, flags, self.seed, self.tile_size)]
+        last_dt = None
+        for tick, buttons in enumerate(self.buttons):
+            dt = self.dts[tick]
+            if dt != last_dt:
+                parts.append(bytes((buttons | NEW_DT,)))
+                parts.append(DT.pack(dt))
+                last_dt = dt
+            else:
+                parts.append(bytes((buttons,)))
+            if self.checksums is not None:
+                parts.append(CHECKSUM.pack(self.checksums[tick]))
+        with open(path, 'wb') as f:
+            f.write(b''.join(parts))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic, version, flags, seed, tile_size = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("%s is not a replay file" % path)
+        if version != VERSION:
+            raise ValueError("unsupported replay version %d" % version)
+
+        recording = cls(seed, tile_size, bool(flags & HAS_CHECKSUMS))
+        offset = HEADER.size
+        dt = None
+        while offset < len(data):
+            buttons = data[offset]
+            offset += 1
+            if buttons & NEW_DT:
+                dt, = DT.unpack_from(data, offset)
+                offset += DT.size
+            recording.buttons.append(buttons & ~NEW_DT)
+            recording.dts.append(dt)
+            if recording.checksums is not None:
+                checksum, = CHECKSUM.unpack_from(data, offset)
+                offset += CHECKSUM.size
+                recording.checksums.append(checksum)
+        return recording
+
+class Recorder:
+    """Appends each tick of a simulation to a Recording."""
+
+    def __init__(self, sim, checksums=True):
+        self.recording = Recording(sim.seed, sim.tile_size, checksums)
+
+    def record(self, sim, dt, inputs):
+        """Call after sim.step(dt, inputs)."""
+        self.recording.buttons.append(inputs.buttons)
+        self.recording.dts.append(dt)
+        if self.recording.checksums is not None:
+            self.recording.checksums.append(state_checksum(sim))
+
+class Replayer:
+    """Feeds a Recording back into a simulation tick by tick.
+
+    next_tick() gives the dt and input for the next step; check() then
+    compares the simulation's state with the recorded checksum, keeping
+    the ticks where they differ.
+    """
+
+    def __init__(self, recording):
+        self.recording = recording
+        self.tick = 0
+        self.mismatches = []
+
+    @property
+    def finished(self):
+        return self.tick >= len(self.recording)
+
+    def next_tick(self):
+        tick = self.tick
+        self.tick += 1
+        return self.recording.dts[tick], InputState(self.recording.buttons[tick])
+
+    def check(self, sim):
+        """Call after stepping; returns False if the state has diverged."""
+        if self.recording.checksums is None:
+            return True
+        if state_checksum(sim) != self.recording.checksums[self.tick - 1]:
+            self.mismatches.append(self.tick - 1)
+            return False
+        return True
+
+def replay_headless(recording):
+    """Replay a recording with no window or audio; returns the simulation and replayer."""
+    sim = Simulation(recording.tile_size, seed=recording.seed)
+    replayer = Replayer(recording)
+    while not replayer.finished:
+        dt, inputs = replayer.next_tick()
+        sim.step(dt, inputs)
+        replayer.check(sim)
+    return sim, replayer
@@ -0,0 +1,128 @@
+import math
+import random
+from player import Player
+from level import DungeonGenerator, LevelContext
+from collision import substep_budget
+from ecs import World
+from perf_overlay import NULL_PROFILER
+
+# Seeds are unsigned 32-bit values
+SEED_RANGE = 2 ** 32
+
+class SilentSound:
+    """Stands in for SoundGenerator when there is no audio device."""
+
+    def begin_frame(self):
+        pass
+
+    def play_sound(self, sound_name):
+        pass
+
+    def update_music(self, level):
+        pass
+
+    def stop_music(self):
+        pass
+
+    def progress(self):
+        return 1.0
+
+class Simulation:
+    """Game logic for one run through the dungeon, from level 1 to victory or death.
+
+    Holds the player and the current level and advances them one tick at a
+    time from an InputState. Nothing here draws or reads the keyboard, so
+    the same code runs behind the window and in headless runs.
+
+    The game logic draws from the global random module, which is seeded
+    here, so the same seed and input stream replay the same run.
+
+    The player, enemies and items of the run share one ecs.World; each
+    level's enemies and items leave it when the next level is loaded.
+    """
+
+    def __init__(self, tile_size, sound_gen=None, max_levels=5, seed=None):
+        # Replay files store the seed in 32 bits, so it is kept to that range
+        self.seed = random.randrange(SEED_RANGE) if seed is None else seed % SEED_RANGE
+        random.seed(self.seed)
+        self.tile_size = tile_size
+        self.sound_gen = sound_gen or SilentSound()
+        self.max_levels = max_levels
+        self.current_level = 1
+        self.difficulty_multiplier = 1.0
+        self.victory = False
+        self.ticks = 0
+        self.world = World()
+        self.player = None
+        self.level = None
+        self._load_level()
+
+    def _load_level(self):
+        if self.level is not None:
+            for entity in list(self.level.enemies) + list(self.level.items):
+                entity.despawn()
+        self.dungeon_generator = DungeonGenerator(100, 100, self.tile_size, self.world)
+        self.level_map, start_pos, self.exit_pos = self.dungeon_generator.generate_dungeon()
+        if self.player is None:
+            self.player = Player(start_pos[0], start_pos[1], self.tile_size, self.world)
+        else:
+            self.player.move_to(start_pos[0], start_pos[1])
+        enemies = self.dungeon_generator.spawn_enemies(int(10 * self.difficulty_multiplier), self.player)
+        items = self.dungeon_generator.spawn_items(5)
+        # Spatial hashes and pathfinding data for the level
+        self.level = LevelContext(self.level_map, enemies, items, self.tile_size)
+
+    @property
+    def game_over(self):
+        return self.player.health <= 0
+
+    @property
+    def finished(self):
+        return self.victory or self.game_over
+
+    def step(self, dt, inputs, profiler=NULL_PROFILER):
+        """Advance the game by one tick of dt seconds.
+
+        The player and enemy updates are timed as separate sections on the
+        given FrameProfiler.
+        """
+        player, level, tile_size = self.player, self.level, self.tile_size
+        substep_budget.begin_frame()
+        self.ticks += 1
+
+        # Update player
+        player.update(dt, inputs, self.level_map, level.enemies, level.items, self.sound_gen,
+                      level.enemy_grid, level.item_grid, level.geometry)
+
+        # Check if player reached exit
+        exit_center = (self.exit_pos[0] + tile_size // 2, self.exit_pos[1] + tile_size // 2)
+        if math.dist(player.rect.center, exit_center) < tile_size:
+            self.current_level += 1
+            self.difficulty_multiplier += 0.2
+
+            if self.current_level > self.max_levels:
+                self.victory = True
+            else:
+                # Generate new level
+                self._load_level()
+                level = self.level
+        profiler.mark('player')
+
+        # Point the shared flow field at the player's tile and advance
+        # queued path searches within this tick's budget
+        level.flow_field.update_from_position(player.rect.centerx, player.rect.centery, tile_size)
+        level.pathfinder.update()
+
+        # Update the enemies the AI scheduler picked, in one vectorized pass
+        active_enemies, enemy_dts = level.ai_scheduler.schedule(dt, player, level.enemy_grid)
+        level.enemy_batch.update(enemy_dts, active_enemies, player, self.sound_gen, level.enemy_grid,
+                                 level.flow_field, level.pathfinder, level.line_of_sight)
+
+        # Remove everything killed or collected this tick
+        for enemy in level.enemies.flush():
+            level.enemy_grid.remove(enemy)
+            enemy.despawn()
+            player.score += 10
+        for item in level.items.flush():
+            item.despawn()
+        profiler.mark('enemy_ai')
@@ -0,0 +1,83 @@
+import hashlib
+import json
+import os
+import sys
+
+def default_cache_dir():
+    """Per-user cache directory for generated sounds."""
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA', os.path.expanduser('~'))
+    elif sys.platform == 'darwin':
+        base = os.path.expanduser('~/Library/Caches')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache'))
+    return os.path.join(base, 'dungeon_explorer', 'sounds')
+
+class SoundCache:
+    """On-disk cache of raw PCM buffers for procedurally generated sounds.
+
+    Each entry is stored as <name>-<hash>.pcm, where the hash covers the
+    sound's synthesis parameters, the generator version and the audio
+    format. Changing any of them produces a new hash, so only that sound
+    is regenerated and its stale file is replaced.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory or default_cache_dir()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, name, params, version, audio_format):
+        """Hash identifying one version of a sound."""
+        payload = json.dumps(
+            {'name': name, 'params': params, 'version': version, 'format': audio_format},
+            sort_keys=True
+        )
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+    def _path(self, name, key):
+        return os.path.join(self.directory, f"{name}-{key}.pcm")
+
+    def load(self, name, key):
+        """Return the cached PCM bytes, or None if the entry is missing."""
+        try:
+            with open(self._path(name, key), 'rb') as f:
+                data = f.read()
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return data
+
+    def store(self, name, key, data):
+        """Write PCM bytes for a sound, replacing older versions of it.
+
+        A cache that cannot be written (read-only home, full disk) is not
+        an error; the sound is simply regenerated on the next launch.
+        """
+        path = self._path(name, key)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # Write to a temporary file first so a crash never leaves a truncated entry
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+            # Drop entries for the same sound made with old parameters
+            self._remove_entries(name, keep=os.path.basename(path))
+        except OSError:
+            pass
+
+    def remove(self, name):
+        """Delete every entry stored under a name, e.g. one no longer used."""
+        try:
+            self._remove_entries(name)
+        except OSError:
+            pass
+
+    def _remove_entries(self, name, keep=None):
+        for filename in os.listdir(self.directory):
+            stem, ext = os.path.splitext(filename)
+            if ext == '.pcm' and stem.rpartition('-')[0] == name and filename != keep:
+                os.remove(os.path.join(self.directory, filename))
@@ -0,0 +1,171 @@
+import math
+import numpy as np
+
+def cone_hit_mask(xs, ys, x, y, radius, facing, half_angle):
+    """Boolean mask of the points (xs, ys) inside a cone at (x, y).
+
+    The cone reaches radius from its apex and spreads half_angle either
+    side of the facing angle. Evaluated for all points in one vectorized
+    pass, comparing against the cosine of half_angle instead of computing
+    an angle per point.
+    """
+    dx = np.asarray(xs, dtype=np.float64) - x
+    dy = np.asarray(ys, dtype=np.float64) - y
+    distance_sq = dx * dx + dy * dy
+    # Projection onto the facing direction versus the cone's edge
+    along = dx * math.cos(facing) + dy * math.sin(facing)
+    # A point on the apex has no direction; it counts as lying at angle 0,
+    # as atan2(0, 0) gives, so it is only hit by a cone facing right
+    apex = distance_sq == 0
+    along = np.where(apex, math.cos(facing), along)
+    distance = np.where(apex, 1.0, np.sqrt(distance_sq))
+    return (distance_sq <= radius * radius) & (along >= distance * math.cos(half_angle))
+
+def entities_in_cone(entities, x, y, radius, facing, half_angle):
+    """The entities whose rect center lies inside a cone at (x, y)."""
+    entities = list(entities)
+    if not entities:
+        return []
+    centers = np.array([entity.rect.center for entity in entities], dtype=np.float64)
+    mask = cone_hit_mask(centers[:, 0], centers[:, 1], x, y, radius, facing, half_angle)
+    return [entity for entity, hit in zip(entities, mask.tolist()) if hit]
+
+class SpatialHash:
+    """Uniform grid of cells for fast proximity queries between entities.
+
+    Entities are stored by their .rect in every cell the rect overlaps.
+    Anything with a rect can be inserted and found with query_rect; the
+    moving entities (update, query_radius, query_square callers) are the
+    World-backed game objects, whose positions are read straight from
+    their world rows.
+    Moving an entity only touches the hash when it crosses into a
+    different set of cells, and queries only look at the cells around the
+    query area, so their cost depends on local density rather than on the
+    total number of entities.
+
+    Cells keep entities in insertion order so query results are
+    deterministic from run to run.
+    """
+
+    def __init__(self, cell_size, entities=()):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.entity_cells = {}
+        for entity in entities:
+            self.insert(entity)
+
+    def _cell_range(self, rect):
+        size = self.cell_size
+        return (
+            rect.left // size,
+            rect.top // size,
+            (rect.right - 1) // size,
+            (rect.bottom - 1) // size
+        )
+
+    def insert(self, entity):
+        cell_range = self._cell_range(entity.rect)
+        self.entity_cells[entity] = cell_range
+        x1, y1, x2, y2 = cell_range
+        for cy in range(y1, y2 + 1):
+            for cx in range(x1, x2 + 1):
+                self.cells.setdefault((cx, cy), {})[entity] = None
+
+    def remove(self, entity):
+        cell_range = self.entity_cells.pop(entity, None)
+        if cell_range is None:
+            return
+        x1, y1, x2, y2 = cell_range
+        for cy in range(y1, y2 + 1):
+            for cx in range(x1, x2 + 1):
+                cell = self.cells.get((cx, cy))
+                if cell is not None:
+                    cell.pop(entity, None)
+                    if not cell:
+                        del self.cells[(cx, cy)]
+
+    def _entity_cell_range(self, entity):
+        # Cell range of a World-backed entity, from its position and size
+        arrays, eid, size = entity.world.arrays, entity.eid, self.cell_size
+        x = int(arrays['x'].item(eid))
+        y = int(arrays['y'].item(eid))
+        width = int(arrays['size'].item(eid))
+        return (x // size, y // size, (x + width - 1) // size, (y + width - 1) // size)
+
+    def update(self, entity):
+        """Re-bucket an entity after it moved; cheap when it stays in its cells."""
+        if self.entity_cells.get(entity) != self._entity_cell_range(entity):
+            self.remove(entity)
+            self.insert(entity)
+
+    def _gather(self, x1, y1, x2, y2):
+        # Unique entities from a block of cells, in a stable order
+        found = {}
+        for cy in range(y1, y2 + 1):
+            for cx in range(x1, x2 + 1):
+                cell = self.cells.get((cx, cy))
+                if cell:
+                    found.update(cell)
+        return found
+
+    def query_rect(self, rect):
+        """Entities whose rect overlaps the given rect."""
+        x1, y1, x2, y2 = self._cell_range(rect)
+        return [entity for entity in self._gather(x1, y1, x2, y2) if entity.rect.colliderect(rect)]
+
+    def query_radius(self, x, y, radius, limit=None):
+        """Entities whose center lies within radius of (x, y).
+
+        With a limit, the cells are visited nearest first and the search
+        stops as soon as limit entities are found, so the cost stays
+        bounded by the limit rather than by how crowded the area is.
+        """
+        size = self.cell_size
+        cells = self.cells
+        x1, y1 = int((x - radius) // size), int((y - radius) // size)
+        x2, y2 = int((x + radius) // size), int((y + radius) // size)
+        keys = [(cx, cy) for cy in range(y1, y2 + 1) for cx in range(x1, x2 + 1) if (cx, cy) in cells]
+        if limit is not None:
+            # Nearest cell centers first; ties keep row order, so results stay deterministic
+            keys.sort(key=lambda cell: ((cell[0] + 0.5) * size - x) ** 2 + ((cell[1] + 0.5) * size - y) ** 2)
+
+        radius_sq = radius * radius
+        result = []
+        seen = set()  # entities spanning several cells are only tested once
+        for key in keys:
+            for entity in cells[key]:
+                if entity in seen:
+                    continue
+                seen.add(entity)
+                arrays, eid = entity.world.arrays, entity.eid
+                half = int(arrays['size'].item(eid)) // 2
+                dx = int(arrays['x'].item(eid)) + half - x
+                dy = int(arrays['y'].item(eid)) + half - y
+                if dx * dx + dy * dy <= radius_sq:
+                    result.append(entity)
+                    if len(result) == limit:
+                        return result
+        return result
+
+    def query_square(self, x, y, radius):
+        """Entities in the cells covering the square of half-width radius around (x, y).
+
+        A cheap candidate list for callers that run their own exact test.
+        """
+        size = self.cell_size
+        return list(self._gather(
+            int((x - radius) // size),
+            int((y - radius) // size),
+            int((x + radius) // size),
+            int((y + radius) // size)
+        ))
+
+    def query_cone(self, x, y, radius, facing, half_angle):
+        """Entities within radius of (x, y) and within half_angle of the facing angle."""
+        return entities_in_cone(self.query_square(x, y, radius), x, y, radius, facing, half_angle)
+
+    def __contains__(self, entity):
+        return entity in self.entity_cells
+
+    def __len__(self):
+        return len(self.entity_cells)
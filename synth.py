@@ -0,0 +1,105 @@
+import numpy as np
+
+# Mixer settings the game initializes pygame.mixer with
+SAMPLE_RATE = 44100
+
+def sample_count(duration, sample_rate=SAMPLE_RATE):
+    """Number of samples needed for a duration in seconds."""
+    return int(sample_rate * duration)
+
+def timeline(duration, sample_rate=SAMPLE_RATE):
+    """Sample times in seconds for a sound of the given duration."""
+    return np.arange(sample_count(duration, sample_rate)) / sample_rate
+
+def sweep(start_freq, end_freq, duration, sample_rate=SAMPLE_RATE):
+    """Per-sample frequencies gliding linearly from start_freq to end_freq."""
+    n_samples = sample_count(duration, sample_rate)
+    return start_freq + (end_freq - start_freq) * (np.arange(n_samples) / n_samples)
+
+def phase_ramp(frequency, n_samples, phase=0.0, sample_rate=SAMPLE_RATE):
+    """Oscillator phase in radians for n_samples + 1 consecutive samples.
+
+    The last entry is the phase the next buffer should start from, which
+    lets streamed sounds continue a waveform without clicks.
+    """
+    if np.ndim(frequency) == 0:
+        return phase + 2 * np.pi * frequency * np.arange(n_samples + 1) / sample_rate
+    frequency = np.asarray(frequency, dtype=np.float64)[:n_samples]
+    steps = np.concatenate(([0.0], np.cumsum(frequency)))
+    return phase + 2 * np.pi * steps / sample_rate
+
+def oscillator(frequency, duration, volume=1.0, waveform='sine', sample_rate=SAMPLE_RATE, phase=0.0):
+    """Generate a mono waveform as a float array in [-volume, volume].
+
+    frequency may be a constant or a per-sample array (from sweep() or a
+    modulated signal). The phase is accumulated sample by sample, so
+    changing frequencies glide smoothly instead of jumping.
+    """
+    phase = phase_ramp(frequency, sample_count(duration, sample_rate), phase, sample_rate)[:-1]
+
+    if waveform == 'sine':
+        wave = np.sin(phase)
+    elif waveform == 'square':
+        wave = np.sign(np.sin(phase))
+    elif waveform == 'triangle':
+        wave = 2 / np.pi * np.arcsin(np.sin(phase))
+    elif waveform == 'saw':
+        wave = 2 * ((phase / (2 * np.pi)) % 1.0) - 1
+    else:
+        raise ValueError(f"Unknown waveform: {waveform}")
+
+    return volume * wave
+
+def fade_out(n_samples, start):
+    """Envelope that holds at 1 and fades linearly to 0 after the start fraction."""
+    envelope = np.ones(n_samples)
+    fade_start = int(n_samples * start)
+    fade_length = n_samples - fade_start
+    if fade_length > 0:
+        envelope[fade_start:] = np.linspace(1.0, 0.0, fade_length, endpoint=False)
+    return envelope
+
+def adsr(n_samples, attack=0.01, decay=0.1, sustain=0.7, release=0.2, sample_rate=SAMPLE_RATE):
+    """Attack/decay/sustain/release envelope; times are in seconds."""
+    attack_n = min(n_samples, int(attack * sample_rate))
+    decay_n = min(n_samples - attack_n, int(decay * sample_rate))
+    release_n = min(n_samples - attack_n - decay_n, int(release * sample_rate))
+    sustain_n = n_samples - attack_n - decay_n - release_n
+
+    return np.concatenate((
+        np.linspace(0.0, 1.0, attack_n, endpoint=False),
+        np.linspace(1.0, sustain, decay_n, endpoint=False),
+        np.full(sustain_n, sustain),
+        np.linspace(sustain, 0.0, release_n, endpoint=False)
+    ))
+
+def to_stereo(mono, pan=0.0):
+    """Convert a float waveform to an interleaved int16 stereo array.
+
+    pan ranges from -1 (left) to 1 (right); 0 plays equally on both sides.
+    """
+    samples = np.clip(mono, -1.0, 1.0) * 32767
+    left = samples * min(1.0, 1.0 - pan)
+    right = samples * min(1.0, 1.0 + pan)
+    return np.column_stack((left, right)).astype(np.int16)
+
+def resample(samples, pitch):
+    """Shift pitch by resampling; pitch > 1 plays higher and shorter.
+
+    samples is an (n, channels) array; every channel is interpolated in
+    one vectorized pass and the original dtype is kept.
+    """
+    n_samples = len(samples)
+    n_out = max(1, int(n_samples / pitch))
+    positions = np.arange(n_out) * pitch
+    index = np.minimum(positions.astype(np.int64), n_samples - 1)
+    next_index = np.minimum(index + 1, n_samples - 1)
+    frac = (positions - index)[:, None]
+    source = samples.astype(np.float64)
+    result = source[index] * (1 - frac) + source[next_index] * frac
+    return result.astype(samples.dtype)
+
+def pan_stereo(stereo, pan=0.0, volume=1.0):
+    """Scale an int16 stereo array by volume and move it left (-1) or right (1)."""
+    gains = np.array([min(1.0, 1.0 - pan), min(1.0, 1.0 + pan)]) * volume
+    return np.clip(stereo * gains, -32768, 32767).astype(np.int16)
@@ -0,0 +1,3 @@
+# Tile values in a level map. Kept in a module of their own so the
+# modules that level.py imports can use them too; level re-exports them.
+EMPTY, WALL, FLOOR = 0, 1, 2
@@ -1,6 +1,20 @@
 import pygame
 import math
 import random
+from particles import ParticleBatch
+
+# Firework colors on the victory screen; a fixed palette keeps the
+# particle sprite cache to a handful of entries
+FIREWORK_COLORS = [
+    (255, 90, 90),
+    (255, 200, 80),
+    (255, 255, 150),
+    (120, 255, 140),
+    (110, 220, 255),
+    (150, 150, 255),
+    (230, 130, 255),
+    (255, 255, 255),
+]
 
 class UI:
     def __init__(self, screen_width, screen_height):
@@ -11,8 +25,12 @@ class UI:
         self.font_small = pygame.font.Font(None, 32)
         self.font_tiny = pygame.font.Font(None, 24)
         
+        # Own generator, so menu effects do not disturb the game's seeded randomness
+        self.rng = random.Random()
+        
         # Particle effects for UI
         self.particles = []
+        self.particle_batch = ParticleBatch()
         self.star_particles = []
         
         # Initialize star particles for menu background
@@ -29,18 +47,18 @@ class UI:
         
         for _ in range(count):
             particle = {
-                'x': random.randint(0, self.screen_width),
-                'y': random.randint(0, self.screen_height),
-                'size': random.uniform(1, 3),
-                'speed': random.uniform(5, 20),
-                'angle': random.uniform(0, math.pi * 2),
+                'x': self.rng.randint(0, self.screen_width),
+                'y': self.rng.randint(0, self.screen_height),
+                'size': self.rng.uniform(1, 3),
+                'speed': self.rng.uniform(5, 20),
+                'angle': self.rng.uniform(0, math.pi * 2),
                 'color': (
-                    random.randint(200, 255),
-                    random.randint(200, 255),
-                    random.randint(200, 255)
+                    self.rng.randint(200, 255),
+                    self.rng.randint(200, 255),
+                    self.rng.randint(200, 255)
                 ),
-                'twinkle_speed': random.uniform(0.5, 2.0),
-                'twinkle_offset': random.uniform(0, math.pi * 2)
+                'twinkle_speed': self.rng.uniform(0.5, 2.0),
+                'twinkle_offset': self.rng.uniform(0, math.pi * 2)
             }
             self.star_particles.append(particle)
     
@@ -243,8 +261,11 @@ class UI:
         # Border
         pygame.draw.rect(surface, border_color, rect, width=1, border_radius=3)
     
-    def draw_main_menu(self, surface):
-        """Draw the main menu screen and return the start button rect."""
+    def draw_main_menu(self, surface, loading_progress=1.0):
+        """Draw the main menu screen and return the start button rect.
+        
+        While loading_progress is below 1.0 a sound loading indicator is shown.
+        """
         self.update_particles(0.016)  # Assume ~60 FPS
         
         # Fill background with very dark blue for better contrast
@@ -347,6 +368,18 @@ class UI:
             is_start_button=True
         )
         
+        # Draw sound loading progress
+        if loading_progress < 1.0:
+            loading_text = f"Loading sounds... {int(loading_progress * 100)}%"
+            loading_pos = (self.screen_width // 2, self.screen_height // 2 + 90)
+            self.draw_text_with_shadow(
+                surface,
+                loading_text,
+                self.font_tiny,
+                (150, 150, 200),
+                loading_pos
+            )
+        
         # Draw controls
         controls_text = "Controls: WASD or Arrow Keys to move, SPACE to attack"
         controls_pos = (self.screen_width // 2, self.screen_height - 100)
@@ -525,22 +558,19 @@ class UI:
             surface.blit(star_surf, (p['x'] - size, p['y'] - size))
         
         # Create firework particles
-        if random.random() < 0.05:  # 5% chance each frame
+        if self.rng.random() < 0.05:  # 5% chance each frame
             # Random position near the top of the screen
-            x = random.randint(100, self.screen_width - 100)
-            y = random.randint(100, self.screen_height - 200)
+            x = self.rng.randint(100, self.screen_width - 100)
+            y = self.rng.randint(100, self.screen_height - 200)
             
-            # Random color
-            r = random.randint(150, 255)
-            g = random.randint(150, 255)
-            b = random.randint(150, 255)
-            color = (r, g, b)
+            # Random color from the palette
+            color = self.rng.choice(FIREWORK_COLORS)
             
             # Create explosion
             for _ in range(50):
-                angle = random.uniform(0, math.pi * 2)
-                speed = random.uniform(50, 150)
-                lifetime = random.uniform(0.5, 1.5)
+                angle = self.rng.uniform(0, math.pi * 2)
+                speed = self.rng.uniform(50, 150)
+                lifetime = self.rng.uniform(0.5, 1.5)
                 
                 particle = {
                     'x': x,
@@ -567,17 +597,17 @@ class UI:
                 particle['y'] += particle['vy'] * 0.016
                 particle['vy'] += particle['gravity'] * 0.016
                 
-                # Draw particle
-                alpha = int(255 * (particle['timer'] / particle['max_timer']))
+                # Queue particle for the batched draw below
                 size = 2 * (particle['timer'] / particle['max_timer'])
                 
-                pygame.draw.circle(
-                    surface,
-                    particle['color'] + (alpha,),
+                self.particle_batch.add(
+                    particle['color'],
                     (int(particle['x']), int(particle['y'])),
                     int(size)
                 )
         
+        self.particle_batch.flush(surface)
+        
         # Draw victory text
         victory_text = "VICTORY!"
         victory_pos = (self.screen_width // 2, self.screen_height // 3)
@@ -0,0 +1,95 @@
+import pygame
+
+class VoicePool:
+    """Front end for sound effect playback over a fixed set of mixer channels.
+
+    Every effect plays on one of the pool's own channels, which keeps the
+    number of simultaneous voices bounded. Playback is managed with:
+
+    - same-frame deduplication: a sound requested twice in one frame is
+      played once and the duplicate is counted as merged
+    - per-sound voice limits: once a sound has max_voices playing, its
+      oldest voice is restarted with the new request
+    - priority stealing: when every channel is busy, the oldest voice with
+      the lowest priority (no higher than the new sound's) is cut off,
+      otherwise the new sound is dropped
+    """
+
+    def __init__(self, first_channel, num_channels):
+        self.channels = [pygame.mixer.Channel(first_channel + i) for i in range(num_channels)]
+        # Per channel: (sound name, priority, play order) or None when free
+        self.voices = [None] * num_channels
+        self.play_counter = 0
+        self.played_this_frame = set()
+
+        # Counters for monitoring audio load
+        self.played = 0
+        self.merged = 0
+        self.stolen = 0
+        self.dropped = 0
+
+    def begin_frame(self):
+        """Start a new frame for same-frame deduplication."""
+        self.played_this_frame.clear()
+
+    def play(self, name, sound, priority=0, max_voices=None):
+        """Play a sound through the pool; returns the channel used or None."""
+        if name in self.played_this_frame:
+            self.merged += 1
+            return None
+
+        # Forget voices whose channels have finished playing
+        for index, channel in enumerate(self.channels):
+            if self.voices[index] is not None and not channel.get_busy():
+                self.voices[index] = None
+
+        index = None
+        if max_voices is not None:
+            same_sound = [i for i, voice in enumerate(self.voices) if voice is not None and voice[0] == name]
+            if len(same_sound) >= max_voices:
+                # Restart the oldest voice of this sound
+                index = min(same_sound, key=lambda i: self.voices[i][2])
+                self.stolen += 1
+
+        if index is None:
+            index = self._free_channel()
+        if index is None:
+            index = self._steal_channel(priority)
+            if index is None:
+                self.dropped += 1
+                return None
+            self.stolen += 1
+
+        channel = self.channels[index]
+        channel.play(sound)
+        self.play_counter += 1
+        self.voices[index] = (name, priority, self.play_counter)
+        self.played_this_frame.add(name)
+        self.played += 1
+        return channel
+
+    def _free_channel(self):
+        for index, voice in enumerate(self.voices):
+            if voice is None:
+                return index
+        return None
+
+    def _steal_channel(self, priority):
+        # Oldest voice among those with the lowest priority not above ours
+        candidates = [i for i, voice in enumerate(self.voices) if voice[1] <= priority]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda i: (self.voices[i][1], self.voices[i][2]))
+
+    def active_voices(self):
+        return sum(1 for voice in self.voices if voice is not None)
+
+    def stats(self):
+        """Playback counters for debugging and profiling."""
+        return {
+            'played': self.played,
+            'merged': self.merged,
+            'stolen': self.stolen,
+            'dropped': self.dropped,
+            'active': self.active_voices(),
+        }